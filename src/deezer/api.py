@@ -1,43 +1,113 @@
 import json
+import threading
 import deezer.utils as utils
 
 
 class Api:
     def __init__(self, deezer_client):
         self.client = deezer_client
+        self._cache = None
+        self._cache_lock = threading.Lock()
 
-    def get_user_favorites_tracks(self, user_id):
-        next_url = f"https://api.deezer.com/user/{user_id}/tracks?limit=10000000000"
+    @property
+    def cache(self):
+        """Cache of the read methods responses, a TTL of 0 disables it for an endpoint"""
+        from deezer.cache import ResponseCache, DEFAULT_TTLS
+
+        with self._cache_lock:
+            if self._cache is None:
+                config = self.client.config
+                memory_entries = config.get_value("cache", "memory_entries", 1024)
+                disk_max_mb = config.get_value("cache", "disk_max_mb", 64)
 
-        # Fetch all tracks ID
-        tracks_list = []
-        while True:
-            response = self.client.session.get(next_url)
-            json_data = response.json()
+                self._cache = ResponseCache(
+                    ttls=config.get_value("cache", "ttl_seconds", dict(DEFAULT_TTLS)),
+                    memory_entries=int(memory_entries),
+                    disk_max_bytes=int(disk_max_mb) * 1024 * 1024,
+                )
 
-            if "error" in json_data:
-                import json
+            return self._cache
 
-                print(json.dumps(json_data, indent=2))
-                return tracks_list
+    def get_user_favorites_tracks(self, user_id):
+        tracks_list = self.get_user_favorites_ids(user_id)
+        if not tracks_list:
+            return tracks_list
 
-            tracks = json_data["data"]
+        return self.get_tracks_data(tracks_list)
 
-            if not tracks:
-                return tracks_list
+    def get_user_favorites_ids(self, user_id):
+        """IDs of the user's favorite tracks, from the public API, or None on error"""
+        tracks = self._paginate_public_api(
+            f"https://api.deezer.com/user/{user_id}/tracks"
+        )
+        if tracks is None:
+            return None
 
-            for track in tracks:
-                tracks_list.append(track["id"])
+        return [str(track["id"]) for track in tracks]
 
-            if "next" in json_data:
-                next_url = json_data["next"]
-                continue
+    def _get_max_workers(self):
+        return int(self.client.config.get_value("api", "max_workers", 4))
 
-            break
+    def _paginate_public_api(self, url):
+        """All the items of a public API listing, or None on error"""
+        from deezer.pagination import (
+            Paginator,
+            public_api_pages,
+            PUBLIC_API_PAGE_SIZE,
+        )
 
-        # Fetch tracks data
-        tracks = []
-        payload = {"sng_ids": tracks_list}
+        return Paginator(
+            public_api_pages(self.client.session, url),
+            PUBLIC_API_PAGE_SIZE,
+            max_workers=self._get_max_workers(),
+        ).get_all()
+
+    def get_tracks_data(self, track_ids):
+        """Songs data of the given track IDs, in the same order"""
+        chunks = {}
+        for index, tracks in self.iter_tracks_data(track_ids, with_index=True):
+            chunks[index] = tracks
+
+        return [track for index in sorted(chunks) for track in chunks[index]]
+
+    def iter_tracks_data(self, track_ids, with_index=False):
+        """
+        Songs data of the given track IDs, by chunks of 'api.tracks_chunk_size' IDs
+        sent concurrently with song.getListData, yielded as they complete.
+        A failed chunk is reported and skipped. With <with_index>, yields
+        (chunk index, songs) so the original order can be rebuilt.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        chunk_size = int(self.client.config.get_value("api", "tracks_chunk_size", 200))
+        max_workers = self._get_max_workers()
+        chunks = [
+            track_ids[offset : offset + chunk_size]
+            for offset in range(0, len(track_ids), max(1, chunk_size))
+        ]
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="api"
+        ) as executor:
+            futures = {
+                executor.submit(self._get_tracks_data, chunk): index
+                for index, chunk in enumerate(chunks)
+            }
+
+            for future in as_completed(futures):
+                try:
+                    tracks = future.result()
+                except Exception as e:
+                    print(f"Error: could not fetch songs data: {e}")
+                    continue
+
+                if tracks is None:
+                    continue
+
+                yield (futures[future], tracks) if with_index else tracks
+
+    def _get_tracks_data(self, track_ids):
+        payload = {"sng_ids": track_ids}
 
         response = self.client.request_api(
             request_type="POST",
@@ -52,56 +122,55 @@ class Api:
         return response["results"]["data"]
 
     def get_user_favorite_artists(self, user_id):
-        next_url = f"https://api.deezer.com/user/{user_id}/artists?limit=10000000000"
-
-        # Fetch all artists ID
-        artists_list = []
-        while True:
-            response = self.client.session.get(next_url)
-            json_data = response.json()
-
-            artists = json_data["data"]
-
-            if not artists:
-                return artists_list
-
-            for artist in artists:
-                artists_list.append({"id": artist["id"], "name": artist["name"]})
-
-            if "next" in json_data:
-                next_url = json_data["next"]
-                continue
-
-            break
+        artists = self._paginate_public_api(
+            f"https://api.deezer.com/user/{user_id}/artists"
+        )
+        if artists is None:
+            return None
 
-        return artists_list
+        return [{"id": artist["id"], "name": artist["name"]} for artist in artists]
 
     def get_all_artist_albums(self, artist_id):
+        """
+        Albums the artist is the main artist of, with their 'artist_id',
+        so compilations and appearances can be told apart without their songs
+        """
         artist_id = utils.extract_id_from_url(artist_id)
 
-        next_url = f"https://api.deezer.com/artist/{artist_id}/albums?limit=10000000000"
-
-        # Fetch all albums ID
-        albums_list = []
-        while True:
-            response = self.client.session.get(next_url)
-            json_data = response.json()
-
-            albums = json_data["data"]
+        return self.cache.get_or_fetch(
+            "artist_albums",
+            f"discography:{artist_id}",
+            lambda: self._get_all_artist_albums(artist_id),
+        )
 
-            if not albums:
-                return albums_list
+    def _get_all_artist_albums(self, artist_id):
+        from deezer.pagination import Paginator, gw_light_pages, GW_LIGHT_PAGE_SIZE
 
-            for album in albums:
-                albums_list.append({"id": album["id"], "name": album["title"]})
+        payload = {
+            "art_id": int(artist_id),
+            "discography_mode": "all",
+            "nb_songs": 0,
+            # Main artist only
+            "filter_role_id": [0],
+        }
 
-            if "next" in json_data:
-                next_url = json_data["next"]
-                continue
+        albums = Paginator(
+            gw_light_pages(self.client, "album.getDiscography", payload),
+            GW_LIGHT_PAGE_SIZE,
+            max_workers=self._get_max_workers(),
+        ).get_all()
 
-            break
+        if albums is None:
+            return None
 
-        return albums_list
+        return [
+            {
+                "id": album["ALB_ID"],
+                "name": album["ALB_TITLE"],
+                "artist_id": album.get("ART_ID"),
+            }
+            for album in albums
+        ]
 
     def get_user_infos(self, user_id):
         url = f"https://api.deezer.com/user/{user_id}/"
@@ -113,8 +182,13 @@ class Api:
 
         return None
 
-    def get_album_infos(self, playlist_id):
-        url = f"https://api.deezer.com/album/{playlist_id}/"
+    def get_album_infos(self, album_id):
+        return self.cache.get_or_fetch(
+            "album_infos", album_id, lambda: self._get_album_infos(album_id)
+        )
+
+    def _get_album_infos(self, album_id):
+        url = f"https://api.deezer.com/album/{album_id}/"
 
         response = self.client.session.get(url)
 
@@ -130,6 +204,11 @@ class Api:
             print(f"Error: could not find track id in URL: {url}")
             return None
 
+        return self.cache.get_or_fetch(
+            "track_data", track_id, lambda: self._get_track_data(track_id)
+        )
+
+    def _get_track_data(self, track_id):
         payload = {"sng_ids": [track_id]}
 
         response = self.client.request_api(
@@ -151,31 +230,78 @@ class Api:
             print(f"Error: could not find album id in URL: {url}")
             return None
 
+        return self.cache.get_or_fetch(
+            "album_data", album_id, lambda: self._get_album_data(album_id)
+        )
+
+    def _get_album_data(self, album_id):
+        from deezer.pagination import Paginator, gw_light_pages, GW_LIGHT_PAGE_SIZE
+
+        # Albums may have more songs than a page holds
+        songs = Paginator(
+            gw_light_pages(
+                self.client, "song.getListByAlbum", {"alb_id": int(album_id)}
+            ),
+            GW_LIGHT_PAGE_SIZE,
+            max_workers=self._get_max_workers(),
+        ).get_all()
+
+        if songs is None:
+            return None
+
+        return {"data": songs, "count": len(songs), "total": len(songs)}
+
+    def get_playlist_infos(self, url):
+        """
+        DATA block of a playlist (CHECKSUM, NB_SONG, DATE_MOD...), without its songs.
+        Never cached, it tells if a playlist changed.
+        """
+        playlist_id = utils.extract_id_from_url(url)
+
+        if not playlist_id:
+            print(f"Error: could not find playlist id in URL: {url}")
+            return None
+
         payload = {
-            "alb_id": int(album_id),
-            "start": 0,
-            "nb": 500,
+            "playlist_id": int(playlist_id),
+            "lang": self.client.user_data["country"],
         }
 
         response = self.client.request_api(
             request_type="POST",
-            method="song.getListByAlbum",
+            method="playlist.getData",
             json_data=payload,
         )
 
+        # request_api returns None on HTTP and API errors
+        if response is None:
+            return None
+
         if len(response["error"]) > 0:
             print(f"Error: deezer API response: {response['error']}")
             return None
 
         return response["results"]
 
-    def get_playlist_data(self, url):
+    def get_playlist_data(self, url, checksum=None):
+        """Playlist page with its songs, a known <checksum> skips outdated cached pages"""
         playlist_id = utils.extract_id_from_url(url)
 
         if not playlist_id:
             print(f"Error: could not find playlist id in URL: {url}")
             return None
 
+        cache_key = f"{playlist_id}:{self.client.user_data['country']}"
+        if checksum:
+            cache_key = f"{cache_key}:{checksum}"
+
+        return self.cache.get_or_fetch(
+            "playlist_data",
+            cache_key,
+            lambda: self._get_playlist_data(playlist_id),
+        )
+
+    def _get_playlist_data(self, playlist_id):
         payload = {
             "playlist_id": int(playlist_id),
             "start": 0,
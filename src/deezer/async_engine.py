@@ -0,0 +1,285 @@
+import os
+import asyncio
+import json
+import threading
+
+import deezer.crypto as crypto
+from deezer.ratelimit import RateLimiter
+from deezer.transport import DEFAULT_TIMEOUT
+from deezer.downloader import Downloader, MEDIA_API_URL
+
+
+class EngineResponse:
+    """Fully read response, with the part of requests.Response the project uses"""
+
+    def __init__(self, status_code, content, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def iter_content(self, chunk_size):
+        for offset in range(0, len(self.content), chunk_size):
+            yield self.content[offset : offset + chunk_size]
+
+
+def get_client_timeout(timeout):
+    """aiohttp.ClientTimeout of a requests timeout, seconds or (connect, read)"""
+    import aiohttp
+
+    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+
+class AsyncEngine:
+    """
+    asyncio event loop running in a background thread, with its own aiohttp
+    session and connection limits. Blocking code submits coroutines with run().
+    Through EngineSession it carries the gw-light and public API calls, and
+    AsyncDownloader sends the media API, CDN and cover requests to it.
+    """
+
+    def __init__(
+        self,
+        headers,
+        cookies,
+        max_connections=100,
+        max_connections_per_host=16,
+        limiter=None,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            print("Error: the async engine requires aiohttp: pip install aiohttp")
+            exit(1)
+
+        self.headers = {
+            name: value
+            for name, value in headers.items()
+            # Let aiohttp negotiate the encodings it supports
+            if name.lower() != "accept-encoding"
+        }
+        self.cookies = cookies
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.limiter = limiter or RateLimiter()
+        # (connect, read) seconds, as for the requests sessions
+        self.timeout = timeout
+        self.session = None
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="async-engine", daemon=True
+        )
+        self.thread.start()
+        self.run(self._open_session())
+
+    async def _open_session(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections_per_host,
+        )
+        # No total timeout, a song transfer takes as long as it needs, but a
+        # stalled connection raises a TimeoutError which the limiter retries
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            cookies=self.cookies,
+            timeout=get_client_timeout(self.timeout),
+        )
+
+    def run(self, coroutine):
+        """Run a coroutine on the engine loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _send(self, method, url, **kwargs):
+        """aiohttp response of a request, rate limited and retried"""
+        import aiohttp
+
+        return await self.limiter.async_send(
+            url,
+            lambda: self.session.request(method, url, **kwargs),
+            retry_exceptions=(aiohttp.ClientConnectionError, asyncio.TimeoutError),
+        )
+
+    async def request(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        json_data=None,
+        headers=None,
+        timeout=None,
+        allow_redirects=True,
+    ):
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = get_client_timeout(timeout)
+
+        response = await self._send(
+            method,
+            url,
+            params=params,
+            data=data,
+            json=json_data,
+            headers=headers,
+            allow_redirects=allow_redirects,
+            **kwargs,
+        )
+
+        async with response:
+            content = await response.read()
+            return EngineResponse(response.status, content, dict(response.headers))
+
+    async def get_url(self, payload):
+        """media.deezer.com/v1/get_url call"""
+        return await self.request("POST", MEDIA_API_URL, json_data=payload)
+
+    async def fetch_song(
+        self, url, key, fo, offset=0, workers=1, chunk_size=crypto.DEFAULT_CHUNK_SIZE
+    ):
+        """Same as Downloader._fetch_song, on the event loop"""
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+
+        response = await self._send("GET", url, headers=headers)
+
+        async with response:
+            if response.status == 200 and offset:
+                # Range ignored by the server, the whole song is sent again
+                fo.seek(-offset, os.SEEK_CUR)
+                fo.truncate()
+                offset = 0
+            elif response.status not in (200, 206):
+                return response.status
+
+            stream = crypto.StreamDecryptor(
+                key,
+                fo,
+                workers=workers,
+                buffer_size=chunk_size,
+                first_stripe=offset // crypto.STRIPE_SIZE,
+            )
+
+            # Decrypting and writing a buffer takes tens of milliseconds, done on
+            # the loop it would stall every other transfer
+            try:
+                async for data in response.content.iter_chunked(chunk_size):
+                    await asyncio.to_thread(stream.write, data)
+
+                await asyncio.to_thread(stream.flush)
+            finally:
+                await asyncio.to_thread(stream.close)
+
+            return response.status
+
+    async def _close_session(self):
+        await self.session.close()
+
+    def close(self):
+        self.run(self._close_session())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class EngineSession:
+    """
+    requests.Session replacement sending its requests through an AsyncEngine.
+    Responses are fully read, 'stream' is accepted but has no effect.
+    Other requests arguments are not supported and raise a TypeError.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def request(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        headers=None,
+        json=None,
+        timeout=None,
+        allow_redirects=True,
+        stream=False,
+        **kwargs,
+    ):
+        if kwargs:
+            raise TypeError(
+                f"EngineSession does not support the arguments: {', '.join(sorted(kwargs))}"
+            )
+
+        return self.engine.run(
+            self.engine.request(
+                method,
+                url,
+                params=params,
+                data=data,
+                json_data=json,
+                headers=headers,
+                timeout=timeout,
+                allow_redirects=allow_redirects,
+            )
+        )
+
+    def get(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+
+class AsyncDownloader(Downloader):
+    """
+    Downloader sending the media API, CDN and cover requests through an
+    AsyncEngine. Songs still run on the download threads, one at a time on each:
+    the engine multiplexes their transfers on its connections, it does not
+    schedule the songs.
+    """
+
+    def __init__(self, deezer_client, engine):
+        super().__init__(deezer_client)
+        self.engine = engine
+
+    def _get_jobs(self):
+        """
+        Songs downloaded at once, 'async_engine.max_workers' unless set by --jobs.
+        One song at a time would leave the engine connections idle.
+        """
+        return self.max_workers or self.client.config.get_value(
+            "async_engine", "max_workers", "auto"
+        )
+
+    def _post_media_api(self, payload):
+        return self.engine.run(self.engine.get_url(payload))
+
+    def _fetch_song(self, song_download_url, key, fo, offset, workers, chunk_size):
+        return self.engine.run(
+            self.engine.fetch_song(
+                song_download_url,
+                key,
+                fo,
+                offset=offset,
+                workers=workers,
+                chunk_size=chunk_size,
+            )
+        )
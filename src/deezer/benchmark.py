@@ -0,0 +1,402 @@
+import io
+import os
+import sys
+import json
+import time
+import platform
+
+import deezer.crypto as crypto
+import deezer.songutils as songutils
+import deezer.utils as utils
+
+BENCHMARK_SONG_ID = "3135556"
+BENCHMARK_REPEAT = 5
+
+BENCHMARK_SONG = {
+    "SNG_ID": BENCHMARK_SONG_ID,
+    "SNG_TITLE": "Harder, Better, Faster, Stronger",
+    "ART_NAME": "Daft Punk",
+    "ALB_TITLE": "Discovery",
+    "ALB_PICTURE": "2e018122cb56986277102d2041a592c8",
+    "TRACK_NUMBER": "4",
+    "DISK_NUMBER": "1",
+    "DURATION": "224",
+    "ISRC": "GBDUW0000059",
+    "FILESIZE_MP3_320": "8967210",
+}
+
+# Realistic titles: accents, non latin scripts, emoji and slashes
+BENCHMARK_TITLES = [
+    ("Beyoncé", "Déjà Vu (feat. Jay-Z)"),
+    ("Sigur Rós", "Hoppípolla"),
+    ("坂本龍一", "戦場のメリークリスマス"),
+    ("BTS (방탄소년단)", "봄날 (Spring Day)"),
+    ("Мумий Тролль", "Владивосток 2000"),
+    ("AC/DC", "Back In Black / Live"),
+    ("Ñengo Flow", "Sin Pijama 🔥 [Remix]"),
+    ("Motörhead", "Ace of Spades - 2005 Remaster"),
+    ("Amr Diab", "تملي معاك"),
+    ("Röyksopp", "What Else Is There?"),
+]
+
+
+class FakeResponse:
+    """Mimics the part of requests.Response used by crypto.decryptfile, PictureStore and the media API"""
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size):
+        for offset in range(0, len(self.content), chunk_size):
+            yield self.content[offset : offset + chunk_size]
+
+
+class FakeSession:
+    """Serves a synthetic cover picture without network access"""
+
+    def __init__(self, picture_size=200 * 1024):
+        self.picture = FakeResponse(b"\xff\xd8\xff\xe0" + os.urandom(picture_size))
+
+    def get(self, url, **kwargs):
+        return self.picture
+
+
+class BenchmarkConfig:
+    """ConfigManager replacement holding its values in memory, defaults are not saved"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def get_value(self, section, key, default=None):
+        return self.values.get(section, {}).get(key, default)
+
+
+class BenchmarkClient:
+    """The part of DeezerClient a Downloader uses, without a Deezer session"""
+
+    def __init__(self, download_path, chunk_size):
+        from deezer.transport import Transport
+
+        self.config = BenchmarkConfig(
+            {
+                "downloads": {
+                    "music_download_path": download_path,
+                    "network_chunk_size_kb": max(1, chunk_size // 1024),
+                }
+            }
+        )
+        self.user_data = {"licenseToken": "benchmark", "userId": "0"}
+        self.transport = Transport()
+
+
+def make_benchmark_downloader(download_path, song_url, chunk_size):
+    """
+    Downloader whose media API resolves every song to <song_url>, with the
+    covers served by a FakeSession. The rest of the download path is the real one.
+    """
+    from deezer.downloader import Downloader
+    from deezer.pictures import PictureStore
+
+    class BenchmarkDownloader(Downloader):
+        def _init_error_log_file(self):
+            # Keep the errors log of the last real run
+            pass
+
+        def _get_pictures(self):
+            if self._pictures is None:
+                self._pictures = PictureStore(FakeSession())
+            return self._pictures
+
+        def _post_media_api(self, payload):
+            media = {"media": [{"format": "MP3_320", "sources": [{"url": song_url}]}]}
+            data = [media for _ in payload["track_tokens"]]
+            return FakeResponse(json.dumps({"data": data}).encode())
+
+    return BenchmarkDownloader(BenchmarkClient(download_path, chunk_size))
+
+
+def make_encrypted_song(song_id, size):
+    """Build a synthetic BF_CBC_STRIPE file, return (plain, encrypted)"""
+    from Crypto.Cipher import Blowfish
+
+    key = crypto.calcbfkey(song_id).encode()
+    plain = b"fLaC" + os.urandom(size - 4)
+    encrypted = bytearray(plain)
+
+    for offset in range(0, size - crypto.STRIPE_SIZE + 1, 3 * crypto.STRIPE_SIZE):
+        stripe = slice(offset, offset + crypto.STRIPE_SIZE)
+        cipher = Blowfish.new(key, Blowfish.MODE_CBC, crypto.STRIPE_IV)
+        encrypted[stripe] = cipher.encrypt(plain[stripe])
+
+    return plain, bytes(encrypted)
+
+
+def measure(function, iterations, repeat=BENCHMARK_REPEAT):
+    """Best time in seconds of <repeat> runs of <iterations> calls to <function>"""
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def bench_decryptfile(size=16 * 1024 * 1024, workers=1):
+    plain, encrypted = make_encrypted_song(BENCHMARK_SONG_ID, size)
+    key = crypto.calcbfkey(BENCHMARK_SONG_ID)
+
+    # Check the fixture decrypts back before timing it
+    fo = io.BytesIO()
+    crypto.decryptfile(FakeResponse(encrypted), key, fo, workers=workers)
+    if fo.getvalue() != plain:
+        raise AssertionError("decryptfile output does not match the fixture")
+
+    elapsed = measure(
+        lambda: crypto.decryptfile(
+            FakeResponse(encrypted), key, io.BytesIO(), workers=workers
+        ),
+        iterations=1,
+    )
+    return {"value": size / elapsed / 1e6, "unit": "MB/s"}
+
+
+def make_stream_server(song_id, size):
+    """
+    Local HTTP server streaming a synthetic encrypted song of <size> bytes.
+    Stripe groups all restart from the same IV, so one encrypted group is
+    repeated and the server memory does not depend on <size>.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    plain_group, encrypted_group = make_encrypted_song(
+        song_id, crypto.STRIPE_GROUP_SIZE
+    )
+
+    class StreamHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+
+            for offset in range(0, size, crypto.STRIPE_GROUP_SIZE):
+                self.wfile.write(encrypted_group[: size - offset])
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, plain_group
+
+
+def stream_download(downloader, output_path, size):
+    """Download the benchmark song with Downloader, return the song file path"""
+    song_data = {
+        **BENCHMARK_SONG,
+        "TRACK_TOKEN": "benchmark",
+        "FILESIZE_MP3_320": str(size),
+    }
+
+    result = downloader._download_song_file("MP3_320", song_data, output_path)
+    if result["error"]:
+        raise AssertionError(f"Download failed: {result['message']}")
+
+    return result["output_file_full_path"]
+
+
+def check_stream_output(output_file, plain_group, size):
+    """Compare the audio between the ID3v2 and ID3v1.1 tags to the fixture"""
+    with open(output_file, "rb") as f:
+        audio_start = songutils.get_id3v2_tag_size(f.read(10))
+        audio_end = os.path.getsize(output_file) - 128
+
+        f.seek(audio_start)
+        offset = 0
+        while offset < audio_end - audio_start:
+            data = f.read(min(len(plain_group), audio_end - audio_start - offset))
+            if data != plain_group[: len(data)]:
+                raise AssertionError(f"Streamed song differs at offset {offset}")
+            offset += len(data)
+
+    if offset != size:
+        raise AssertionError(f"Streamed song has {offset} bytes instead of {size}")
+
+
+def bench_stream_download(
+    size=64 * 1024 * 1024, chunk_size=crypto.DEFAULT_CHUNK_SIZE
+):
+    """
+    Download a synthetic song from a local server with a Downloader, and check
+    its audio. Its bounded memory is checked by tests/test_streaming.py.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server, plain_group = make_stream_server(BENCHMARK_SONG_ID, size)
+        url = f"http://127.0.0.1:{server.server_address[1]}/song.mp3"
+        downloader = make_benchmark_downloader(tmp_dir, url, chunk_size)
+
+        try:
+            start = time.perf_counter()
+            output_file = stream_download(downloader, tmp_dir, size)
+            elapsed = time.perf_counter() - start
+            check_stream_output(output_file, plain_group, size)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    return {"value": size / elapsed / 1e6, "unit": "MB/s"}
+
+
+def bench_calcbfkey(iterations=20000):
+    elapsed = measure(lambda: crypto.calcbfkey(BENCHMARK_SONG_ID), iterations)
+    return {"value": iterations / elapsed, "unit": "calls/s"}
+
+
+def bench_genurlkey(iterations=20000):
+    md5_origin = "51afcde9f56a132096c0496cc95eb24b"
+    elapsed = measure(
+        lambda: songutils.genurlkey(BENCHMARK_SONG_ID, md5_origin, 4, 3), iterations
+    )
+    return {"value": iterations / elapsed, "unit": "calls/s"}
+
+
+def bench_writeid3v2(iterations=2000):
+    from deezer.pictures import PictureStore
+
+    pictures = PictureStore(FakeSession())
+    elapsed = measure(
+        lambda: songutils.writeid3v2(pictures, io.BytesIO(), BENCHMARK_SONG), iterations
+    )
+    return {"value": iterations / elapsed, "unit": "tags/s"}
+
+
+def bench_writeid3v1_1(iterations=20000):
+    elapsed = measure(
+        lambda: songutils.writeid3v1_1(io.BytesIO(), BENCHMARK_SONG), iterations
+    )
+    return {"value": iterations / elapsed, "unit": "tags/s"}
+
+
+def bench_sanitize_folder_name(iterations=2000):
+    def run():
+        for index, (artist, title) in enumerate(BENCHMARK_TITLES):
+            utils.sanitize_folder_name(f"{artist} - {title}", str(index))
+
+    elapsed = measure(run, iterations)
+    return {"value": iterations * len(BENCHMARK_TITLES) / elapsed, "unit": "names/s"}
+
+
+def bench_get_song_filename(iterations=20000):
+    def run():
+        for artist, title in BENCHMARK_TITLES:
+            utils.get_song_filename(artist, title, "flac")
+
+    elapsed = measure(run, iterations)
+    return {"value": iterations * len(BENCHMARK_TITLES) / elapsed, "unit": "names/s"}
+
+
+BENCHMARKS = {
+    "decryptfile": bench_decryptfile,
+    "stream_download": bench_stream_download,
+    "calcbfkey": bench_calcbfkey,
+    "genurlkey": bench_genurlkey,
+    "writeid3v2": bench_writeid3v2,
+    "writeid3v1_1": bench_writeid3v1_1,
+    "sanitize_folder_name": bench_sanitize_folder_name,
+    "get_song_filename": bench_get_song_filename,
+}
+
+
+def run_benchmarks():
+    results = {}
+
+    for name, benchmark in BENCHMARKS.items():
+        # Benchmarks also check their output, a failed check is reported as an error
+        try:
+            results[name] = benchmark()
+        except AssertionError as e:
+            results[name] = {"error": str(e)}
+            print(f"{name:<24} Error: {e}")
+            continue
+
+        print(f"{name:<24} {results[name]['value']:>14.1f} {results[name]['unit']}")
+
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def find_regressions(report, baseline, threshold_percent):
+    """Benchmarks slower than the baseline by more than <threshold_percent>"""
+    regressions = []
+
+    for name, result in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "error" in previous or "error" in result:
+            continue
+
+        # All benchmarks are throughputs, higher is better
+        change = (result["value"] - previous["value"]) / previous["value"] * 100
+        if change < -threshold_percent:
+            regressions.append(
+                {
+                    "name": name,
+                    "baseline": previous["value"],
+                    "value": result["value"],
+                    "unit": result["unit"],
+                    "change_percent": change,
+                }
+            )
+
+    return regressions
+
+
+def main(output_file, baseline_file=None, threshold_percent=20):
+    """Run the benchmarks, write them as JSON and compare them to a previous run"""
+    print("Running hot path benchmarks...\n")
+    report = run_benchmarks()
+
+    utils.write_to_json(
+        os.path.dirname(os.path.abspath(output_file)),
+        os.path.basename(output_file),
+        report,
+    )
+    print(f"\nResults written to: {output_file}")
+
+    failed = [name for name, result in report["results"].items() if "error" in result]
+
+    if not baseline_file:
+        return not failed
+
+    with open(baseline_file, "r") as f:
+        baseline = json.load(f)
+
+    regressions = find_regressions(report, baseline, threshold_percent)
+
+    if not regressions:
+        print(f"No regression over {threshold_percent}% against {baseline_file}")
+        return not failed
+
+    for regression in regressions:
+        print(
+            f"Error: {regression['name']} regressed by {-regression['change_percent']:.1f}%: "
+            f"{regression['baseline']:.1f} -> {regression['value']:.1f} {regression['unit']}"
+        )
+
+    return False
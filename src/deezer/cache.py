@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+CACHE_FILE_PATH = os.path.join(os.path.expanduser("~"), ".deezer-dl", "cache.db")
+# Songs data expires this many seconds before their track tokens
+TRACK_TOKEN_MARGIN = 600
+
+# Seconds an API response stays valid, by endpoint
+DEFAULT_TTLS = {
+    "album_infos": 7 * 24 * 3600,
+    "album_data": 24 * 3600,
+    "playlist_data": 3600,
+    "track_data": 7 * 24 * 3600,
+    "artist_albums": 24 * 3600,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def get_track_tokens_expiry(response):
+    """Earliest TRACK_TOKEN_EXPIRE of the songs in a gw-light response, or None"""
+    if isinstance(response, list):
+        expiries = [get_track_tokens_expiry(item) for item in response]
+    elif isinstance(response, dict):
+        expiries = [get_track_tokens_expiry(item) for item in response.values()]
+        if "TRACK_TOKEN_EXPIRE" in response:
+            expiries.append(int(response["TRACK_TOKEN_EXPIRE"]))
+    else:
+        return None
+
+    expiries = [expiry for expiry in expiries if expiry is not None]
+    return min(expiries) if expiries else None
+
+
+class ResponseCache:
+    """
+    Cache of API responses stored as JSON, with a TTL per endpoint.
+    Responses are kept in an in-process LRU of <memory_entries> items, in front
+    of an SQLite store of at most <disk_max_bytes>, least recently used first out.
+    """
+
+    def __init__(
+        self,
+        db_path=CACHE_FILE_PATH,
+        ttls=None,
+        memory_entries=1024,
+        disk_max_bytes=64 * 1024 * 1024,
+    ):
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.lock = threading.Lock()
+        # key: (expires_at, value)
+        self.memory = OrderedDict()
+        self.stats = {}
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(SCHEMA)
+            self.disk_size = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+
+    def _count(self, endpoint, counter):
+        endpoint_stats = self.stats.setdefault(
+            endpoint, {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        )
+        endpoint_stats[counter] += 1
+
+    def _remember(self, key, expires_at, value):
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _get(self, endpoint, key):
+        """Cached JSON of <key>, or None if missing or expired"""
+        now = time.time()
+
+        with self.lock:
+            if key in self.memory:
+                expires_at, value = self.memory[key]
+                if expires_at > now:
+                    self.memory.move_to_end(key)
+                    self._count(endpoint, "memory_hits")
+                    return value
+
+                del self.memory[key]
+
+            row = self.connection.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or row[1] <= now:
+                self._count(endpoint, "misses")
+                return None
+
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+
+            self._remember(key, row[1], row[0])
+            self._count(endpoint, "disk_hits")
+            return row[0]
+
+    def _put(self, key, value, expires_at):
+        now = time.time()
+        size = len(key) + len(value)
+
+        with self.lock, self.connection:
+            previous = self.connection.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, expires_at, now),
+            )
+            self.disk_size += size - (previous[0] if previous else 0)
+            self._remember(key, expires_at, value)
+
+            if self.disk_size > self.disk_max_bytes:
+                self._evict(now)
+
+    def _evict(self, now):
+        """Drop expired responses, then the least recently used ones, down to 3/4 of the limit"""
+        self.connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+
+        target = self.disk_max_bytes * 3 // 4
+        total = 0
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at DESC"
+        ).fetchall():
+            total += size
+            if total > target:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.memory.pop(key, None)
+                total -= size
+
+        self.disk_size = total
+
+    def get_or_fetch(self, endpoint, key, fetch):
+        """
+        Cached response of <endpoint> for <key>, or the result of fetch(), cached
+        if it is not None. Every call returns a new copy of the response.
+        """
+        key = f"{endpoint}:{key}"
+        ttl = self.ttls.get(endpoint, 0)
+
+        if ttl <= 0:
+            return fetch()
+
+        value = self._get(endpoint, key)
+        if value is not None:
+            return json.loads(value)
+
+        response = fetch()
+
+        # Errors are not cached
+        if response is None or (isinstance(response, dict) and "error" in response):
+            return response
+
+        # Songs can only be downloaded while their track token is valid
+        expires_at = time.time() + ttl
+        token_expires_at = get_track_tokens_expiry(response)
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at - TRACK_TOKEN_MARGIN)
+
+        if expires_at > time.time():
+            self._put(key, json.dumps(response), expires_at)
+
+        return response
+
+    def get_stats(self):
+        with self.lock:
+            return {endpoint: dict(stats) for endpoint, stats in self.stats.items()}
+
+    def print_stats(self):
+        stats = self.get_stats()
+
+        if not stats:
+            return
+
+        hits = sum(s["memory_hits"] + s["disk_hits"] for s in stats.values())
+        misses = sum(s["misses"] for s in stats.values())
+        print(f"API cache: {hits} hits, {misses} misses")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
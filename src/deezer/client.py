@@ -3,12 +3,15 @@ import requests
 
 from deezer.api import Api
 from deezer.downloader import Downloader
+from deezer.transport import Transport
 
 
 class DeezerClient:
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, engine="requests"):
         self.config = config_manager
         self.session = None
+        self.transport = None
+        self.engine = None
         self.user_data = []
         self.api = Api(deezer_client=self)
         self.arl_cookie = self.config.get_value("deezer", "arl_cookie")
@@ -16,6 +19,32 @@ class DeezerClient:
         self._init_session()
         self._fetch_csrf_token_and_user_data()
 
+        if engine == "async":
+            self._init_async_engine()
+
+    def _init_async_engine(self):
+        """Send all the following requests through an asyncio engine"""
+        import atexit
+        from deezer.async_engine import AsyncEngine, AsyncDownloader, EngineSession
+
+        self.engine = AsyncEngine(
+            headers=dict(self.session.headers),
+            cookies=self.session.cookies.get_dict(),
+            max_connections=int(
+                self.config.get_value("async_engine", "max_connections", 100)
+            ),
+            max_connections_per_host=int(
+                self.config.get_value("async_engine", "max_connections_per_host", 16)
+            ),
+            limiter=self.transport.limiter,
+        )
+        atexit.register(self.engine.close)
+
+        self.session = EngineSession(self.engine)
+        self.transport.session = self.session
+        self.transport.media_session = self.session
+        self.downloader = AsyncDownloader(deezer_client=self, engine=self.engine)
+
     def _init_session(self):
         header = {
             "Pragma": "no-cache",
@@ -32,10 +61,41 @@ class DeezerClient:
             "DNT": "1",
         }
 
-        self.session = requests.session()
+        self.transport = Transport(
+            pool_connections=int(
+                self.config.get_value("transport", "pool_connections", 50)
+            ),
+            pool_maxsize=int(self.config.get_value("transport", "pool_maxsize", 32)),
+            limiter=self._init_rate_limiter(),
+        )
+
+        self.session = self.transport.session
         self.session.headers.update(header)
         self.session.cookies.update({"arl": self.arl_cookie, "comeback": "1"})
 
+    def _init_rate_limiter(self):
+        """Requests per second and burst by endpoint family, a rate of 0 disables the limit"""
+        from deezer.ratelimit import (
+            RateLimiter,
+            ConcurrencyController,
+            DEFAULT_LIMITS,
+            DEFAULT_CONCURRENCY,
+        )
+
+        # Requests in flight by endpoint family, adjusted to the service response
+        concurrency = ConcurrencyController(
+            limits=self.config.get_value("concurrency", "limits", DEFAULT_CONCURRENCY),
+        )
+
+        return RateLimiter(
+            limits=self.config.get_value("rate_limit", "limits", DEFAULT_LIMITS),
+            max_retries=int(self.config.get_value("rate_limit", "max_retries", 5)),
+            backoff_max=float(
+                self.config.get_value("rate_limit", "backoff_max_seconds", 60)
+            ),
+            concurrency=concurrency,
+        )
+
     def _fetch_csrf_token_and_user_data(self):
         api_url = "https://www.deezer.com/ajax/gw-light.php?method=deezer.getUserData&input=3&api_version=1.0&api_token="
         print("Fetching CSRF token and user data...")
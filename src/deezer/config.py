@@ -1,5 +1,6 @@
 import yaml
 import os
+import threading
 
 
 CONFIG_DEFAULT_TEMPLATE = {
@@ -11,6 +12,8 @@ CONFIG_DEFAULT_TEMPLATE = {
         "music_download_path": "/path/to/your/music/",
         "use_links_for_duplicates": "true",
         "duplicates_link_type": "symlink",
+        "max_workers": 1,
+        "fsync": "none",
     },
 }
 
@@ -20,6 +23,8 @@ class ConfigManager:
         global CONFIG_DEFAULT_TEMPLATE
         self.file_path = file_path
         self.default_template = CONFIG_DEFAULT_TEMPLATE
+        # Songs are downloaded from several threads, which may add default values
+        self.lock = threading.RLock()
         self._load_config()
 
     def _load_config(self):
@@ -63,6 +68,10 @@ class ConfigManager:
 
     def get_value(self, section, key, default=None):
         """Gets the value of a key in a section. Returns default if not found and saves it to the config."""
+        with self.lock:
+            return self._get_value(section, key, default)
+
+    def _get_value(self, section, key, default=None):
         if section not in self.config or key not in self.config.get(section, {}):
             if default is not None:
                 self.set_value(section, key, default)
@@ -71,13 +80,15 @@ class ConfigManager:
 
     def set_value(self, section, key, value):
         """Sets the value of a key in a section. Creates the section if it does not exist."""
-        if section not in self.config:
-            self.add_section(section)
-        self.config[section][key] = value
-        self.save()
+        with self.lock:
+            if section not in self.config:
+                self.add_section(section)
+            self.config[section][key] = value
+            self.save()
 
     def save(self):
         """Writes the current configuration to the file."""
-        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-        with open(self.file_path, "w") as file:
-            yaml.safe_dump(self.config, file, default_flow_style=False)
+        with self.lock:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            with open(self.file_path, "w") as file:
+                yaml.safe_dump(self.config, file, default_flow_style=False)
@@ -1,7 +1,24 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from Crypto.Hash import MD5
 from Crypto.Cipher import AES, Blowfish
+from Crypto.Util.strxor import strxor
 from binascii import a2b_hex, b2a_hex
 
+STRIPE_SIZE = 2048
+STRIPE_IV = a2b_hex("0001020304050607")
+STRIPE_GROUP_SIZE = 3 * STRIPE_SIZE
+# Bytes read from the network at once, re-sliced into stripes
+DEFAULT_CHUNK_SIZE = 256 * 1024
+# Stripe groups handed to each worker per batch in parallel mode
+PARALLEL_GROUPS_PER_WORKER = 64
+
+# Threads of the parallel decryptions, shared by all the songs of the process
+_decrypt_executor = None
+_decrypt_executor_lock = threading.Lock()
+
 
 def md5hex(data):
     """return hex string of md5 of the given string"""
@@ -27,29 +44,189 @@ def calcbfkey(songid):
 
 
 def blowfishDecrypt(data, key):
-    iv = a2b_hex("0001020304050607")
-    c = Blowfish.new(key.encode(), Blowfish.MODE_CBC, iv)
+    c = Blowfish.new(key.encode(), Blowfish.MODE_CBC, STRIPE_IV)
     return c.decrypt(data)
 
 
-def decryptfile(fh, key, fo):
+class StripeDecryptor:
     """
-    Decrypt data from file <fh>, and write to file <fo>.
-    decrypt using blowfish with <key>.
-    Only every third 2048 byte block is encrypted.
+    Decrypt BF_CBC_STRIPE stripes in place.
+    The Blowfish key schedule is computed once, CBC is done by hand on top
+    of an ECB cipher so every stripe can restart from the fixed IV.
+    """
+
+    def __init__(self, key):
+        self.cipher = Blowfish.new(key.encode(), Blowfish.MODE_ECB)
+        self.scratch = bytearray(STRIPE_SIZE)
+        # IV followed by the ciphertext shifted by one Blowfish block
+        self.chain = bytearray(STRIPE_SIZE)
+        self.chain[: Blowfish.block_size] = STRIPE_IV
+
+    def decrypt_stripe(self, stripe):
+        """Decrypt one whole 2048 byte stripe (writable buffer) in place"""
+        self.cipher.decrypt(stripe, output=self.scratch)
+        self.chain[Blowfish.block_size :] = stripe[: -Blowfish.block_size]
+        strxor(self.scratch, self.chain, output=stripe)
+
+    def decrypt(self, view, first_stripe=0):
+        """Decrypt in place every encrypted whole stripe of <view>"""
+        decrypt_stripes(self, view, first_stripe)
+
+
+def decrypt_stripes(decryptor, view, first_stripe=0):
+    """
+    Decrypt in place every encrypted whole stripe of <view>.
+    <first_stripe> is the index of the stripe <view> starts with.
     """
-    blockSize = 2048
-    i = 0
+    for offset in range(0, len(view) - STRIPE_SIZE + 1, STRIPE_SIZE):
+        if (first_stripe + offset // STRIPE_SIZE) % 3 == 0:
+            decryptor.decrypt_stripe(view[offset : offset + STRIPE_SIZE])
+
+
+def get_decrypt_executor():
+    """
+    Thread pool of the parallel decryptions, one thread per CPU. Songs decrypted
+    at the same time share it, instead of starting a pool each.
+    """
+    global _decrypt_executor
+
+    with _decrypt_executor_lock:
+        if _decrypt_executor is None:
+            _decrypt_executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="stripe-decrypt"
+            )
+        return _decrypt_executor
+
+
+class ParallelStripeDecryptor:
+    """
+    Decrypt the stripes of large buffers across the shared decrypt thread pool.
+    Stripes all restart from the fixed IV, so a buffer can be split in
+    <workers> segments that are decrypted independently, in place.
+    pycryptodome releases the GIL while it runs the cipher.
+    """
+
+    def __init__(self, key, workers):
+        self.key = key
+        self.workers = workers
+        self.executor = get_decrypt_executor()
+        self.local = threading.local()
+
+    def _get_decryptor(self):
+        # Cipher objects are not thread safe, one per worker thread
+        if not hasattr(self.local, "decryptor"):
+            self.local.decryptor = StripeDecryptor(self.key)
+        return self.local.decryptor
+
+    def _decrypt_segment(self, view, first_stripe):
+        decrypt_stripes(self._get_decryptor(), view, first_stripe)
 
-    for data in fh.iter_content(blockSize):
-        if not data:
-            break
+    def decrypt(self, view, first_stripe=0):
+        """Decrypt in place every encrypted whole stripe of <view>"""
+        # Split on stripe group boundaries so each worker gets a similar share
+        groups = -(-len(view) // STRIPE_GROUP_SIZE)
+        segment_size = -(-groups // self.workers) * STRIPE_GROUP_SIZE
 
-        isEncrypted = (i % 3) == 0
-        isWholeBlock = len(data) == blockSize
+        futures = [
+            self.executor.submit(
+                self._decrypt_segment,
+                view[offset : offset + segment_size],
+                first_stripe + offset // STRIPE_SIZE,
+            )
+            for offset in range(0, len(view), segment_size)
+        ]
 
-        if isEncrypted and isWholeBlock:
-            data = blowfishDecrypt(data, key)
+        for future in futures:
+            future.result()
+
+    def close(self):
+        # The pool is shared, it outlives the song
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StreamDecryptor:
+    """
+    Decrypt a BF_CBC_STRIPE stream fed by chunks of any size, and write it to <fo>.
+    Chunks are re-sliced into aligned stripes in a reusable buffer, which is
+    decrypted in place and written a whole buffer at a time.
+    With <workers> greater than 1, the stripes of a buffer are decrypted in parallel.
+    """
+
+    def __init__(
+        self, key, fo, workers=1, buffer_size=DEFAULT_CHUNK_SIZE, first_stripe=0
+    ):
+        self.fo = fo
+        self.workers = workers
+        # Index of the stripe the buffer starts with, not 0 when resuming a download
+        self.stripe = first_stripe
+
+        if workers > 1:
+            self.decryptor = ParallelStripeDecryptor(key, workers)
+            buffer_size = max(
+                buffer_size, workers * PARALLEL_GROUPS_PER_WORKER * STRIPE_GROUP_SIZE
+            )
+        else:
+            self.decryptor = StripeDecryptor(key)
+
+        # Full buffers always hold whole stripe groups, the stripe pattern repeats
+        self.buffer_size = (
+            max(1, -(-buffer_size // STRIPE_GROUP_SIZE)) * STRIPE_GROUP_SIZE
+        )
+        self.buffer = memoryview(bytearray(self.buffer_size))
+        self.filled = 0
+
+    def write(self, data):
+        data = memoryview(data)
+
+        while data:
+            taken = min(len(data), self.buffer_size - self.filled)
+            self.buffer[self.filled : self.filled + taken] = data[:taken]
+            self.filled += taken
+            data = data[taken:]
+
+            if self.filled == self.buffer_size:
+                self.decryptor.decrypt(self.buffer, self.stripe)
+                self.fo.write(self.buffer)
+                self.stripe += self.buffer_size // STRIPE_SIZE
+                self.filled = 0
+
+    def flush(self):
+        """Write the last partial buffer, a trailing partial stripe stays as is"""
+        if self.filled:
+            self.decryptor.decrypt(self.buffer[: self.filled], self.stripe)
+            self.fo.write(self.buffer[: self.filled])
+            self.stripe += self.filled // STRIPE_SIZE
+            self.filled = 0
+
+    def close(self):
+        if self.workers > 1:
+            self.decryptor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def decryptfile(fh, key, fo, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, first_stripe=0):
+    """
+    Decrypt data from file <fh>, and write to file <fo>.
+    decrypt using blowfish with <key>.
+    Only every third 2048 byte block is encrypted.
+    Data is read by chunks of <chunk_size> bytes, independently of the stripe size.
+    <first_stripe> is the index of the stripe <fh> starts with, for resumed downloads.
+    """
+    with StreamDecryptor(
+        key, fo, workers=workers, buffer_size=chunk_size, first_stripe=first_stripe
+    ) as stream:
+        for data in fh.iter_content(chunk_size):
+            stream.write(data)
 
-        fo.write(data)
-        i += 1
+        stream.flush()
@@ -1,16 +1,306 @@
 import os
 import json
+import time
+import threading
 import deezer.utils as utils
 import deezer.songutils as songutils
 
 ERROR_LOG_FILE_PATH = os.path.join(os.path.expanduser("~"), ".deezer-dl", "errors.log")
+MEDIA_API_URL = "https://media.deezer.com/v1/get_url"
 
 
 class Downloader:
     def __init__(self, deezer_client):
         self.client = deezer_client
+        # Number of songs downloaded at the same time, overrides 'downloads.max_workers'
+        self.max_workers = None
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # Download URLs resolved by batches: queued track tokens with their
+        # position in the download order, resolved infos, and tokens being resolved
+        self._media_lock = threading.Lock()
+        self._media_resolved = threading.Condition(self._media_lock)
+        self._media_queue = {}
+        self._media_order = []
+        self._media_infos = {}
+        self._media_pending = set()
+        # Song files renamed into place but not fsynced yet, for the 'batch' policy
+        self._fsync_lock = threading.Lock()
+        self._fsync_pending = []
+        self._library = None
+        self._library_lock = threading.Lock()
+        self._pictures = None
+        # Songs downloaded by download_all or a favorite artists crawl, by SNG_ID,
+        # reused by the rest of the run
+        self._planned_songs = {}
+        self._remember_songs = False
         self._init_error_log_file()
 
+    def _get_max_workers(self):
+        """
+        Threads downloading songs. With 'auto', there are as many as the highest
+        CDN concurrency limit, and the controller decides how many run at once.
+        """
+        max_workers = self._get_jobs()
+
+        if str(max_workers) == "auto":
+            return self._get_concurrency().get_max_limit("cdn")
+
+        return max(1, int(max_workers))
+
+    def _get_jobs(self):
+        """Songs downloaded at once, from --jobs or the config: a number or 'auto'"""
+        return self.max_workers or self.client.config.get_value(
+            "downloads", "max_workers", 1
+        )
+
+    def _get_concurrency(self):
+        """Adaptive concurrency limits by endpoint family, shared with the sessions"""
+        return self.client.transport.limiter.concurrency
+
+    def _get_cdn_permit(self):
+        """
+        Permit of a song transfer. Only 'auto' jobs wait for the CDN concurrency
+        limit, an explicit number of jobs is the number of songs at once.
+        """
+        from contextlib import nullcontext
+
+        if str(self._get_jobs()) == "auto":
+            return self._get_concurrency().permit("cdn")
+
+        return nullcontext()
+
+    def _get_lock(self, key):
+        """Lock shared by all threads working on the same file or song"""
+        with self._locks_lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _map_songs(self, function, songs):
+        """
+        Call <function> on each song, concurrently. Results keep the songs order.
+        Songs go by chunks of 'api.tracks_chunk_size', and the track tokens about
+        to expire are refreshed just before their chunk, as listing many songs
+        can take longer than their tokens last.
+        """
+        max_workers = self._get_max_workers()
+        chunk_size = max(
+            1, int(self.client.config.get_value("api", "tracks_chunk_size", 200))
+        )
+        results = []
+
+        try:
+            for offset in range(0, len(songs), chunk_size):
+                chunk = self._refresh_track_tokens(songs[offset : offset + chunk_size])
+                self._queue_songs_download_infos(chunk)
+
+                try:
+                    if max_workers == 1 or len(chunk) <= 1:
+                        results.extend(function(song) for song in chunk)
+                    else:
+                        results.extend(self._run_songs(function, chunk, max_workers))
+                finally:
+                    self._unqueue_songs_download_infos(chunk)
+
+            return results
+        finally:
+            self.sync_song_files()
+
+    def _is_track_token_expiring(self, song, now=None):
+        """Whether the song track token expires within the cache margin"""
+        from deezer.cache import TRACK_TOKEN_MARGIN
+
+        if not song.get("TRACK_TOKEN") or not song.get("TRACK_TOKEN_EXPIRE"):
+            return False
+
+        now = time.time() if now is None else now
+        return int(song["TRACK_TOKEN_EXPIRE"]) < now + TRACK_TOKEN_MARGIN
+
+    def _refresh_track_tokens(self, songs):
+        """
+        The songs, with fresh data for the ones whose track token is about to
+        expire, fetched with one song.getListData request per chunk
+        """
+        now = time.time()
+        expiring_ids = [
+            song["SNG_ID"]
+            for song in songs
+            if self._is_track_token_expiring(song, now)
+            and not self._is_song_downloaded(song)
+        ]
+        if not expiring_ids:
+            return songs
+
+        fresh_songs = {
+            song["SNG_ID"]: song
+            for song in self.client.api.get_tracks_data(expiring_ids)
+        }
+        return [fresh_songs.get(song["SNG_ID"], song) for song in songs]
+
+    def _run_songs(self, function, songs, max_workers):
+        """Call <function> on each song, on a pool of <max_workers> threads"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="song-download"
+        ) as executor:
+            return list(executor.map(function, songs))
+
+    def _get_library(self):
+        """Index of the songs downloaded to the music directory"""
+        from deezer.library import LibraryIndex, LIBRARY_INDEX_FILE_NAME
+
+        with self._library_lock:
+            if self._library is None:
+                download_path = self.client.config.get_value(
+                    "downloads", "music_download_path"
+                )
+                self._library = LibraryIndex(
+                    os.path.join(download_path, LIBRARY_INDEX_FILE_NAME)
+                )
+
+            return self._library
+
+    def _get_pictures(self):
+        """Store of the pictures downloaded to the music directory"""
+        from deezer.pictures import PictureStore, PICTURE_STORE_DIR_NAME
+
+        with self._library_lock:
+            if self._pictures is None:
+                download_path = self.client.config.get_value(
+                    "downloads", "music_download_path"
+                )
+                memory_max_mb = self.client.config.get_value(
+                    "downloads", "picture_cache_mb", 32
+                )
+                self._pictures = PictureStore(
+                    self.client.transport.media_session,
+                    store_dir=os.path.join(download_path, PICTURE_STORE_DIR_NAME),
+                    memory_max_bytes=int(memory_max_mb) * 1024 * 1024,
+                )
+
+            return self._pictures
+
+    def _get_picture_size(self, key):
+        """
+        Size of a picture variant: 'embedded_cover_size' for the cover in the song
+        tags, 'cover_size' for cover.jpg, 'playlist_picture_size' for playlist pictures.
+        """
+        default_sizes = {
+            "embedded_cover_size": 500,
+            "cover_size": songutils.DEFAULT_PICTURE_SIZE,
+            "playlist_picture_size": songutils.DEFAULT_PICTURE_SIZE,
+        }
+        size = self.client.config.get_value("downloads", key, default_sizes[key])
+        return max(1, int(size))
+
+    def _index_song(self, song_data, result, prefered_audio_quality, album_dir):
+        """Record a downloaded song, or a song file found on disk, in the library index"""
+        from deezer.library import file_checksum
+
+        library = self._get_library()
+        song_file = os.path.abspath(result["output_file_full_path"])
+        track = library.get_track(song_data["SNG_ID"]) or {}
+
+        # Downloaded songs have their media format, files found on disk do not
+        downloaded = "format" in result
+
+        album_path = os.path.abspath(album_dir) if album_dir else track.get("album_path")
+
+        # Already indexed
+        if not downloaded and (track.get("path"), track.get("album_path")) == (
+            song_file,
+            album_path,
+        ):
+            return
+
+        if downloaded:
+            song_format = result["format"]
+            quality = prefered_audio_quality
+            checksum = result.get("checksum") or file_checksum(song_file)
+        else:
+            song_format = track.get("format") or os.path.splitext(song_file)[1][1:]
+            quality = track.get("quality")
+            checksum = track.get("checksum")
+
+        library.add_track(
+            {
+                "sng_id": song_data["SNG_ID"],
+                "path": song_file,
+                "format": song_format,
+                "quality": quality,
+                "size": os.path.getsize(song_file),
+                "isrc": song_data.get("ISRC"),
+                "alb_id": song_data.get("ALB_ID"),
+                "checksum": checksum,
+                "album_path": album_path,
+            }
+        )
+
+    def _get_song_album_dir(self, download_path, song):
+        """
+        Album directory of a song, with its cover. Songs in the library index
+        already have one, without requesting the album infos.
+        """
+        planned = self._planned_songs.get(song["SNG_ID"])
+        if planned and planned["album_dir"]:
+            return planned["album_dir"]
+
+        track = self._get_library().get_track(song["SNG_ID"])
+        if track and track["album_path"] and os.path.isdir(track["album_path"]):
+            return track["album_path"]
+
+        album_infos = self.client.api.get_album_infos(song["ALB_ID"])
+        album_artist = "Unknown"
+
+        if album_infos:
+            if "error" not in album_infos:
+                if (
+                    album_infos["artist"]["name"] == "Various Artists"
+                    and "label" in album_infos
+                ):
+                    album_artist = album_infos["label"]
+                else:
+                    album_artist = album_infos["artist"]["name"]
+
+        album_artist = utils.sanitize_replace_slash(album_artist)
+
+        song_album_dir = os.path.join(
+            download_path, "Library", "Artists", album_artist, song["ALB_TITLE"]
+        )
+
+        # Create song album dir
+        os.makedirs(song_album_dir, exist_ok=True)
+
+        # Download album cover
+        album_cover_id = song["ALB_PICTURE"]
+        album_cover_file = os.path.join(song_album_dir, "cover.jpg")
+        self._download_cover(
+            file_output=album_cover_file,
+            pic_type="cover",
+            pic_id=album_cover_id,
+        )
+
+        return song_album_dir
+
+    def _create_link(self, src, dest, link_type):
+        """Create a link, unless the destination already exists"""
+        with self._get_lock(("file", dest)):
+            if not os.path.exists(dest):
+                utils.create_link(src=src, dest=dest, link_type=link_type)
+
+    def _download_cover(self, file_output, pic_type, pic_id):
+        """Download a picture, unless the file already exists"""
+        with self._get_lock(("file", file_output)):
+            if not os.path.exists(file_output):
+                self._get_pictures().place(
+                    file_output=file_output,
+                    pic_type=pic_type,
+                    pic_id=pic_id,
+                    size=self._get_picture_size("cover_size"),
+                )
+
     def _get_preferred_audio_quality(self, preferred__audio_quality: str) -> list[dict]:
         all_qualities = [
             {"cipher": "BF_CBC_STRIPE", "format": "FLAC"},
@@ -31,11 +321,32 @@ class Downloader:
 
         return preferred_qualities
 
-    def _get_song_download_infos(self, track_token, prefered_audio_quality, song_id):
-        import requests
+    def _post_media_api(self, payload):
+        return self.client.transport.media_session.post(MEDIA_API_URL, json=payload)
+
+    def _parse_media_data(self, media_data):
+        """Download infos of one item of the get_url response 'data' list"""
+        if "media" not in media_data:
+            if media_data.get("errors"):
+                return {"error": True, "message": media_data["errors"][0]["message"]}
 
-        api_url = "https://media.deezer.com/v1/get_url"
+            print("Error: 'media' item not found when requesting for song download URL")
+            return {"error": True, "message": "No media found"}
 
+        if len(media_data["media"]) == 0:
+            return {"error": True, "message": "No media found"}
+
+        media = media_data["media"][0]
+        media_url = media["sources"][0]["url"]
+        media_format = media["format"].lower()
+
+        return {"format": media_format, "url": media_url}
+
+    def _request_songs_download_infos(self, track_tokens, prefered_audio_quality):
+        """
+        Resolve the download URLs of many songs with one get_url request.
+        Returns {track_token: infos}, or an error dict if the request failed.
+        """
         license_token = self.client.user_data["licenseToken"]
 
         payload = {
@@ -48,37 +359,238 @@ class Downloader:
                     ),
                 }
             ],
-            "track_tokens": [track_token],
+            "track_tokens": track_tokens,
         }
 
-        req = requests.post(api_url, json=payload)
+        req = self._post_media_api(payload)
 
         if req.status_code != 200:
-            return {
-                "error": True,
-                "message": f"Received status {req.status_code} when getting download URLs for song {song_id}",
-            }
+            return {"error": True, "status": req.status_code}
 
-        rcv_data = req.json()
-        data = rcv_data["data"]
+        data = req.json().get("data") or []
 
-        if data and len(data) > 0:
-            if "media" not in data[0]:
-                if data[0]["errors"]:
-                    return {"error": True, "message": data[0]["errors"][0]["message"]}
-                else:
-                    print(
-                        "Error: 'media' item not found when requesting for song download URL"
-                    )
+        # Results are in the same order as the track tokens
+        return {
+            track_token: self._parse_media_data(media_data)
+            for track_token, media_data in zip(track_tokens, data)
+        }
 
-            if len(data[0]["media"]) == 0:
-                return {"error": True, "message": "No media found"}
+    def _is_song_downloaded(self, song):
+        """Whether the song was downloaded by this run, or is in the library index"""
+        return song["SNG_ID"] in self._planned_songs or bool(
+            self._get_library().get_track(song["SNG_ID"])
+        )
 
-            media = data[0]["media"][0]
-            media_url = media["sources"][0]["url"]
-            media_format = media["format"].lower()
+    def _queue_songs_download_infos(self, songs):
+        """
+        Register the track tokens of songs about to be downloaded, so their
+        download URLs are resolved by batches. Songs already downloaded need no
+        URL, and fallbacks are resolved only when their main source fails.
+        """
+        track_tokens = [
+            song["TRACK_TOKEN"]
+            for song in songs
+            if song.get("TRACK_TOKEN") and not self._is_song_downloaded(song)
+        ]
 
-            return {"format": media_format, "url": media_url}
+        with self._media_lock:
+            for track_token in track_tokens:
+                if track_token not in self._media_queue:
+                    self._media_queue[track_token] = len(self._media_order)
+                    self._media_order.append(track_token)
+
+    def _unqueue_songs_download_infos(self, songs):
+        with self._media_lock:
+            for song in songs:
+                if song.get("TRACK_TOKEN"):
+                    self._media_queue.pop(song["TRACK_TOKEN"], None)
+                    self._media_infos.pop(song["TRACK_TOKEN"], None)
+
+            if not self._media_queue:
+                self._media_order = []
+
+    def _get_media_batch(self, track_token):
+        """
+        <track_token> followed by the next queued tokens, neither resolved nor
+        being resolved. Called with the media lock held.
+        """
+        batch_size = int(
+            self.client.config.get_value("downloads", "media_url_batch_size", 100)
+        )
+        batch = [track_token]
+
+        # Only the songs after this one, the ones before are done or skipped.
+        # A fallback is not queued, its batch starts with the first queued song
+        position = self._media_queue.get(track_token, -1) + 1
+
+        while position < len(self._media_order) and len(batch) < batch_size:
+            queued_token = self._media_order[position]
+            position += 1
+
+            # Tokens already used are not queued anymore
+            if (
+                queued_token in self._media_queue
+                and queued_token not in self._media_infos
+                and queued_token not in self._media_pending
+            ):
+                batch.append(queued_token)
+
+        return batch
+
+    def _get_song_download_infos(self, track_token, prefered_audio_quality, song_id):
+        # Songs are downloaded in order, so resolving the next queued songs
+        # with this one gives them fresh URLs and one request per batch
+        with self._media_lock:
+            # Wait for the batch another song is resolving this token with
+            while track_token in self._media_pending:
+                self._media_resolved.wait()
+
+            infos = self._media_infos.pop(track_token, None)
+            self._media_queue.pop(track_token, None)
+
+            if infos is None:
+                batch = self._get_media_batch(track_token)
+                self._media_pending.update(batch)
+
+        if infos is None:
+            # The lock is not held during the request, other songs keep using
+            # the URLs already resolved
+            resolved = {}
+            try:
+                resolved = self._request_songs_download_infos(
+                    batch, prefered_audio_quality
+                )
+            finally:
+                with self._media_lock:
+                    # Only the songs still waiting for their URL, before waking them up
+                    if not resolved.get("error"):
+                        self._media_infos.update(
+                            (queued_token, queued_infos)
+                            for queued_token, queued_infos in resolved.items()
+                            if queued_token in self._media_queue
+                        )
+
+                    self._media_pending.difference_update(batch)
+                    self._media_resolved.notify_all()
+
+            if resolved.get("error"):
+                return {
+                    "error": True,
+                    "message": f"Received status {resolved['status']} when getting download URLs for song {song_id}",
+                }
+
+            infos = resolved.get(track_token)
+
+        if infos is None:
+            return {"error": True, "message": "No media found"}
+
+        return infos
+
+    def _get_fresh_download_url(
+        self, song_data, prefered_audio_quality, song_media_format
+    ):
+        """
+        New download URL of a song, with a get_url request of its own, or None.
+        An expired track token gets no URL, the song data is fetched again first.
+        """
+        if self._is_track_token_expiring(song_data):
+            song_data = self._refresh_track_tokens([song_data])[0]
+
+        track_token = song_data["TRACK_TOKEN"]
+        infos = self._request_songs_download_infos(
+            [track_token], prefered_audio_quality
+        ).get(track_token)
+
+        # The song file name depends on the format, it must not change
+        if not infos or infos.get("format") != song_media_format:
+            return None
+
+        return infos["url"]
+
+    def _get_decrypt_workers(self, song_data, song_media_format):
+        """Number of threads to decrypt a song with, based on its announced size"""
+        threshold_mb = self.client.config.get_value(
+            "downloads", "parallel_decrypt_threshold_mb", 32
+        )
+        workers = self.client.config.get_value(
+            "downloads", "parallel_decrypt_workers", os.cpu_count() or 1
+        )
+
+        try:
+            file_size = int(song_data.get(f"FILESIZE_{song_media_format.upper()}", 0))
+        except ValueError:
+            file_size = 0
+
+        if file_size < int(threshold_mb) * 1024 * 1024:
+            return 1
+
+        return max(1, int(workers))
+
+    def _get_network_chunk_size(self):
+        """Size of the reads from the CDN response, independent of the stripe size"""
+        chunk_size_kb = self.client.config.get_value(
+            "downloads", "network_chunk_size_kb", 256
+        )
+        return max(1, int(chunk_size_kb)) * 1024
+
+    def _get_fsync_policy(self):
+        """
+        'downloads.fsync': 'none' leaves the writes to the OS, 'file' fsyncs each
+        song file before renaming it into place, a number N fsyncs songs by groups of N.
+        """
+        policy = str(self.client.config.get_value("downloads", "fsync", "none"))
+
+        if policy.isdigit():
+            return "batch", max(1, int(policy))
+
+        if policy not in ("none", "file"):
+            print(f"Error: unknown 'downloads.fsync' value '{policy}', using 'none'")
+            return "none", 0
+
+        return policy, 1
+
+    def _fsync_dir(self, dir_path):
+        """Make a rename durable, not possible on every platform"""
+        try:
+            fd = os.open(dir_path, os.O_RDONLY)
+        except OSError:
+            return
+
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _sync_song_file(self, output_file):
+        """Called once <output_file> is renamed into place, apply the fsync policy"""
+        policy, batch_size = self._get_fsync_policy()
+
+        if policy == "file":
+            self._fsync_dir(os.path.dirname(output_file))
+        elif policy == "batch":
+            with self._fsync_lock:
+                self._fsync_pending.append(output_file)
+                if len(self._fsync_pending) < batch_size:
+                    return
+
+            self.sync_song_files()
+
+    def sync_song_files(self):
+        """fsync the song files, and their directories, waiting for a group fsync"""
+        with self._fsync_lock:
+            pending, self._fsync_pending = self._fsync_pending, []
+
+        for file_path in pending:
+            try:
+                with open(file_path, "rb") as f:
+                    os.fsync(f.fileno())
+            except OSError as e:
+                print(f"Error: Could not fsync '{file_path}': {e}")
+
+        for dir_path in sorted({os.path.dirname(file_path) for file_path in pending}):
+            self._fsync_dir(dir_path)
 
     def _init_error_log_file(self):
         # Delete previous logs
@@ -92,15 +604,48 @@ class Downloader:
         open(ERROR_LOG_FILE_PATH, "x")
 
     def _log_error(self, message):
-        with open(ERROR_LOG_FILE_PATH, "r") as lf:
-            if message in lf.read():
-                return
+        with self._get_lock(("file", ERROR_LOG_FILE_PATH)):
+            with open(ERROR_LOG_FILE_PATH, "r") as lf:
+                if message in lf.read():
+                    return
+
+            with open(ERROR_LOG_FILE_PATH, "a") as lf:
+                lf.write(message + "\n")
+
+    def _download_song(
+        self, prefered_audio_quality, song_data, output_path, album_dir=None
+    ):
+        """
+        Download a song to <output_path>, unless it is already there.
+        <album_dir> is the album directory the song file is in, or linked from.
+        """
+        # Songs of the download_all plan are already downloaded for this run
+        planned = self._planned_songs.get(song_data["SNG_ID"])
+        if planned and planned["output_path"] == output_path:
+            return planned["result"]
+
+        # The same song can be in a list twice, only one thread downloads it
+        with self._get_lock(("song", song_data["SNG_ID"], output_path)):
+            result = self._download_song_file(
+                prefered_audio_quality, song_data, output_path
+            )
+
+            if not result["error"]:
+                self._index_song(song_data, result, prefered_audio_quality, album_dir)
+
+                if self._remember_songs:
+                    self._planned_songs.setdefault(
+                        song_data["SNG_ID"],
+                        {
+                            "output_path": output_path,
+                            "album_dir": album_dir,
+                            "result": result,
+                        },
+                    )
 
-        with open(ERROR_LOG_FILE_PATH, "a") as lf:
-            lf.write(message + "\n")
+            return result
 
-    def _download_song(self, prefered_audio_quality, song_data, output_path):
-        import requests
+    def _download_song_file(self, prefered_audio_quality, song_data, output_path):
         import deezer.crypto as crypto
 
         song_title = song_data["SNG_TITLE"]
@@ -181,29 +726,47 @@ class Downloader:
 
         # Download song
         try:
-            fh = requests.get(song_download_url)
-
-            if fh.status_code != 200:
-                return {
-                    "error": True,
-                    "mesage": f"Error {fh.status_code}: Could not download '{song_filename}'",
-                }
+            # Songs with the same file name would share the same '.part' file
+            with self._get_lock(("file", output_file)):
+                if not os.path.exists(output_file):
+                    # One CDN permit per song transfer, with 'auto' jobs
+                    with self._get_cdn_permit():
+                        written = self._write_song_file(
+                            song_download_url,
+                            key,
+                            output_file,
+                            song_data,
+                            song_media_format,
+                        )
 
-            # create parent dir if dont exists
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                    # A batched URL may expire before its song's turn, resolve it alone
+                    if written["error"] and written.get("status") == 403:
+                        song_download_url = self._get_fresh_download_url(
+                            song_data, prefered_audio_quality, song_media_format
+                        )
 
-            with open(output_file, "w+b") as fo:
-                # Add song cover
-                songutils.writeid3v2(self.client.session, fo, song_data)
-                # Decrypt song file
-                crypto.decryptfile(fh, key, fo)
-                # Add song metadata
-                songutils.writeid3v1_1(fo, song_data)
+                        if song_download_url:
+                            with self._get_cdn_permit():
+                                written = self._write_song_file(
+                                    song_download_url,
+                                    key,
+                                    output_file,
+                                    song_data,
+                                    song_media_format,
+                                )
+
+                    if written["error"]:
+                        return written
+                else:
+                    # Written by another thread meanwhile
+                    written = {"checksum": None}
 
             return {
                 "error": False,
                 "output_file_full_path": output_file,
                 "output_file_name": song_filename,
+                "format": song_media_format,
+                "checksum": written["checksum"],
             }
 
         except Exception as e:
@@ -211,12 +774,170 @@ class Downloader:
                 "error": True,
                 "message": f"Error: Could not download {song_filename}\n{str(e)}",
             }
-            exit(1)
+
+    def _write_song_file(
+        self, song_download_url, key, output_file, song_data, song_media_format
+    ):
+        """
+        Download, decrypt and tag a song file. Returns an error dict on failure,
+        else its 'checksum', computed while writing, None for a resumed download.
+        The song is written to a '.part' file, renamed once complete, so an existing
+        song file is always whole. An interrupted download resumes from the last
+        whole stripe of the '.part' file, if it holds the same song stream.
+        """
+        import deezer.crypto as crypto
+        from deezer.library import ChecksumWriter
+
+        part_file = f"{output_file}.part"
+        # Stream the '.part' file holds, a resume must fetch the same one
+        part_infos_file = f"{part_file}.json"
+        part_infos = {
+            "sng_id": song_data["SNG_ID"],
+            "format": song_media_format,
+            "size": song_data.get(f"FILESIZE_{song_media_format.upper()}"),
+        }
+
+        # create parent dir if dont exists
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+        # A '.part' file of another format or song version is useless
+        if (
+            os.path.exists(part_file)
+            and self._read_part_infos(part_infos_file) != part_infos
+        ):
+            print(f"Download restarted, the song stream changed: {output_file}")
+            os.remove(part_file)
+
+        # Audio already downloaded, after the ID3v2 tag
+        audio_start = 0
+        resume_offset = 0
+        if os.path.exists(part_file):
+            with open(part_file, "rb") as f:
+                audio_start = songutils.get_id3v2_tag_size(f.read(10))
+
+            # Start over if the '.part' file does not hold the whole ID3v2 tag
+            audio_size = os.path.getsize(part_file) - audio_start
+            if audio_start and audio_size >= 0:
+                resume_offset = audio_size - audio_size % crypto.STRIPE_SIZE
+            else:
+                audio_start = 0
+
+        with open(part_file, "r+b" if audio_start else "w+b") as fo:
+            checksum_writer = None
+            if audio_start:
+                print(f"Resuming download at {resume_offset} bytes: {output_file}")
+            else:
+                with open(part_infos_file, "w") as f:
+                    json.dump(part_infos, f)
+
+                # Written from its start, the file is hashed on the way
+                checksum_writer = ChecksumWriter(fo)
+                fo = checksum_writer
+
+                # Add song cover
+                songutils.writeid3v2(
+                    self._get_pictures(),
+                    fo,
+                    song_data,
+                    cover_size=self._get_picture_size("embedded_cover_size"),
+                )
+                audio_start = fo.tell()
+
+            fo.seek(audio_start + resume_offset)
+            fo.truncate()
+
+            # Decrypt song file
+            status = self._fetch_song(
+                song_download_url,
+                key,
+                fo,
+                resume_offset,
+                workers=self._get_decrypt_workers(song_data, song_media_format),
+                chunk_size=self._get_network_chunk_size(),
+            )
+
+            if status in (200, 206):
+                # Add song metadata
+                songutils.writeid3v1_1(fo, song_data)
+
+                if self._get_fsync_policy()[0] == "file":
+                    fo.flush()
+                    os.fsync(fo.fileno())
+
+        # Range past the end of the song, start over
+        if status == 416:
+            os.remove(part_file)
+            return self._write_song_file(
+                song_download_url, key, output_file, song_data, song_media_format
+            )
+
+        if status not in (200, 206):
+            return {
+                "error": True,
+                "status": status,
+                "message": f"Error {status}: Could not download '{os.path.basename(output_file)}'",
+            }
+
+        # Atomic on the same filesystem, a song file is either complete or missing
+        os.replace(part_file, output_file)
+        os.remove(part_infos_file)
+        self._sync_song_file(output_file)
+
+        return {
+            "error": False,
+            "checksum": checksum_writer.hexdigest() if checksum_writer else None,
+        }
+
+    def _read_part_infos(self, part_infos_file):
+        """Stream infos saved next to a '.part' file, None if missing or unreadable"""
+        try:
+            with open(part_infos_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _fetch_song(self, song_download_url, key, fo, offset, workers, chunk_size):
+        """
+        Stream a song from the CDN from byte <offset>, decrypt it and write it to <fo>,
+        positioned at that offset of the audio. Returns the HTTP status.
+        """
+        import deezer.crypto as crypto
+
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+
+        # Stream the response, only one chunk of the song is in memory at a time
+        with self.client.transport.media_session.get(
+            song_download_url, stream=True, headers=headers
+        ) as fh:
+            if fh.status_code == 200 and offset:
+                # Range ignored by the server, the whole song is sent again
+                fo.seek(-offset, os.SEEK_CUR)
+                fo.truncate()
+                offset = 0
+            elif fh.status_code not in (200, 206):
+                return fh.status_code
+
+            crypto.decryptfile(
+                fh,
+                key,
+                fo,
+                workers=workers,
+                chunk_size=chunk_size,
+                first_stripe=offset // crypto.STRIPE_SIZE,
+            )
+
+            return fh.status_code
 
     def download_favorites(
         self,
         download_to_tracks_and_create_m3u=True,
+        favorites_ids=None,
+        favorites_tracks=None,
     ):
+        """
+        Sync the user's favorite songs. <favorites_ids> and <favorites_tracks>, songs
+        data by SNG_ID, are the ones listed by download_all beforehand.
+        """
         user_id = self.client.user_data["userId"]
 
         # Settings
@@ -226,11 +947,15 @@ class Downloader:
         )
 
         # Fetching user's favorites track
-        print("Fetching user's favorites track list...")
-        favorites_tracks = self.client.api.get_user_favorites_tracks(user_id)
-        print(f"Found {len(favorites_tracks)} tracks!")
+        if favorites_ids is None:
+            print("Fetching user's favorites track list...")
+            favorites_ids = self.client.api.get_user_favorites_ids(user_id)
+            if favorites_ids is None:
+                return
+
+        print(f"Found {len(favorites_ids)} tracks!")
 
-        if not favorites_tracks:
+        if not favorites_ids:
             print("No tracks found!")
             return
 
@@ -239,6 +964,24 @@ class Downloader:
         if not download_to_tracks_and_create_m3u:
             os.makedirs(favorites_dir, exist_ok=True)
 
+        library = self._get_library()
+        previous_ids = set(library.get_favorites(user_id) or [])
+
+        synced_paths = self._get_favorites_synced_paths(
+            user_id, favorites_ids, download_path, download_to_tracks_and_create_m3u
+        )
+        added_ids = [song_id for song_id in favorites_ids if not synced_paths[song_id]]
+
+        if previous_ids:
+            removed_count = len(previous_ids - set(favorites_ids))
+            failed_count = len(
+                set(library.get_failed_favorites(user_id)) & set(added_ids)
+            )
+            print(
+                f"{len(added_ids)} tracks to sync ({failed_count} failed before), "
+                f"{removed_count} removed"
+            )
+
         # Create 'Tracks' folder to store all songs if we should use links for duplicates files
         use_links_for_duplicates = self.client.config.get_value(
             "downloads", "use_links_for_duplicates"
@@ -251,11 +994,8 @@ class Downloader:
         if use_links_for_duplicates:
             os.makedirs(tracks_dir, exist_ok=True)
 
-        # List of downloaded songs for M3U playlist file
-        downloaded_songs = []
-
-        # Download songs
-        for song in favorites_tracks:
+        # Download one song, returns its path for the M3U playlist file
+        def download_favorite(song):
             song_title = song["SNG_TITLE"]
             artist_name = song["ART_NAME"]
 
@@ -267,38 +1007,7 @@ class Downloader:
                 ""  # Full file name will be returned by the "_download_song" function
             )
 
-            album_infos = self.client.api.get_album_infos(song["ALB_ID"])
-            album_artist = "Unknown"
-
-            if album_infos:
-                if "error" not in album_infos:
-                    if (
-                        album_infos["artist"]["name"] == "Various Artists"
-                        and "label" in album_infos
-                    ):
-                        album_artist = album_infos["label"]
-                    else:
-                        album_artist = album_infos["artist"]["name"]
-
-            album_artist = utils.sanitize_replace_slash(album_artist)
-
-            song_album_dir = os.path.join(
-                download_path, "Library", "Artists", album_artist, song["ALB_TITLE"]
-            )
-
-            # Create song album dir
-            os.makedirs(song_album_dir, exist_ok=True)
-
-            # Download album cover
-            album_cover_id = song["ALB_PICTURE"]
-            album_cover_file = os.path.join(song_album_dir, "cover.jpg")
-            if not os.path.exists(album_cover_file):
-                utils.download_image(
-                    self.client.session,
-                    file_output=album_cover_file,
-                    pic_type="cover",
-                    pic_id=album_cover_id,
-                )
+            song_album_dir = self._get_song_album_dir(download_path, song)
 
             if not download_to_tracks_and_create_m3u:
                 # When using links for duplicates
@@ -308,11 +1017,12 @@ class Downloader:
                         prefered_audio_quality=prefered_audio_quality,
                         song_data=song,
                         output_path=tracks_dir,
+                        album_dir=song_album_dir,
                     )
 
                     if result["error"]:
                         print(f"Error: {result['message']}. Skipping.")
-                        continue
+                        return None
 
                     song_file_path_in_tracks = result["output_file_full_path"]
                     song_file_name = result["output_file_name"]
@@ -325,20 +1035,18 @@ class Downloader:
                     )
 
                     # Create song link from 'Tracks' directory to its album folder
-                    if not os.path.exists(song_file_path_in_album):
-                        utils.create_link(
-                            src=song_file_path_in_tracks,
-                            dest=song_file_path_in_album,
-                            link_type=duplicates_links_type,
-                        )
+                    self._create_link(
+                        src=song_file_path_in_tracks,
+                        dest=song_file_path_in_album,
+                        link_type=duplicates_links_type,
+                    )
 
                     # Create song link from 'Tracks' folder to the 'Favorites' directory
-                    if not os.path.exists(song_file_path_in_favorites):
-                        utils.create_link(
-                            src=song_file_path_in_tracks,
-                            dest=song_file_path_in_favorites,
-                            link_type=duplicates_links_type,
-                        )
+                    self._create_link(
+                        src=song_file_path_in_tracks,
+                        dest=song_file_path_in_favorites,
+                        link_type=duplicates_links_type,
+                    )
 
                 # When NOT using links for duplicates
                 else:
@@ -351,37 +1059,79 @@ class Downloader:
 
                     if result["error"]:
                         print(f"Error: {result['message']}. Skipping.")
-                        continue
+
+                return None
             else:
                 # Download track to 'Tracks' directory
                 result = self._download_song(
                     prefered_audio_quality=prefered_audio_quality,
                     song_data=song,
                     output_path=tracks_dir,
+                    album_dir=song_album_dir,
                 )
 
                 if result["error"]:
                     print(f"Error: {result['message']}. Skipping.")
-                    continue
+                    return None
 
                 song_file_name = result["output_file_name"]
                 song_file_path_in_tracks = result["output_file_full_path"]
                 song_file_path_in_album = os.path.join(song_album_dir, song_file_name)
 
                 # Create song link from its album folder to the 'Tracks' directory
-                if not os.path.exists(song_file_path_in_album):
-                    utils.create_link(
-                        src=song_file_path_in_tracks,
-                        dest=song_file_path_in_album,
-                        link_type=duplicates_links_type,
-                    )
+                self._create_link(
+                    src=song_file_path_in_tracks,
+                    dest=song_file_path_in_album,
+                    link_type=duplicates_links_type,
+                )
+
+                relative_path_in_tracks = os.path.relpath(
+                    song_file_path_in_album, os.path.join(download_path, "Library")
+                ).replace(os.sep, "/")
+
+                return relative_path_in_tracks
+
+        # Only the songs added since the last sync need their data, fetched by
+        # chunks, each downloaded as soon as it arrives
+        if favorites_tracks is None:
+            tracks_chunks = self.client.api.iter_tracks_data(added_ids)
+        else:
+            tracks_chunks = [
+                [favorites_tracks[i] for i in added_ids if i in favorites_tracks]
+            ]
+
+        downloaded_paths = {}
+        for tracks in tracks_chunks:
+            song_paths = self._map_songs(download_favorite, tracks)
+
+            # Paths of downloaded songs for M3U playlist file
+            for song, song_path in zip(tracks, song_paths):
+                downloaded_paths[song["SNG_ID"]] = song_path
 
-                relative_path_in_tracks = (
-                    f"Artists/{album_artist}/{song['ALB_TITLE']}/{song_file_name}"
+        # Links to the songs removed from the favorites since the last sync
+        if not download_to_tracks_and_create_m3u and use_links_for_duplicates:
+            self._remove_song_links(favorites_dir, previous_ids - set(favorites_ids))
+
+        # List of downloaded songs for M3U playlist file, in the favorites order
+        downloaded_songs = []
+        for song_id in favorites_ids:
+            if downloaded_paths.get(song_id):
+                downloaded_songs.append(downloaded_paths[song_id])
+            elif synced_paths[song_id] and download_to_tracks_and_create_m3u:
+                downloaded_songs.append(
+                    os.path.relpath(
+                        synced_paths[song_id], os.path.join(download_path, "Library")
+                    ).replace(os.sep, "/")
                 )
 
-                # Add song to M3U playlist
-                downloaded_songs.append(relative_path_in_tracks)
+        # Remember the favorites synced, only the ones which failed and the new
+        # ones are downloaded next time
+        failed_ids = [
+            song_id for song_id in added_ids if not library.get_track(song_id)
+        ]
+        failed = set(failed_ids)
+        synced_ids = [song_id for song_id in favorites_ids if song_id not in failed]
+        library.set_favorites(user_id, synced_ids, failed_ids)
 
         # Generate M3U playlist file
         if download_to_tracks_and_create_m3u:
@@ -395,6 +1145,34 @@ class Downloader:
             songs=downloaded_songs,
         )
 
+    def _get_favorites_synced_paths(
+        self, user_id, favorites_ids, download_path, download_to_tracks_and_create_m3u
+    ):
+        """
+        Path of each favorite song synced before, in its album directory or the
+        'Favorites' one, None for the songs to download
+        """
+        library = self._get_library()
+        previous_ids = set(library.get_favorites(user_id) or [])
+        favorites_dir = os.path.join(download_path, "Favorites")
+
+        def get_synced_path(song_id):
+            if song_id not in previous_ids:
+                return None
+
+            if download_to_tracks_and_create_m3u:
+                song_paths = self._get_songs_album_paths([song_id])
+                return song_paths[0] if song_paths else None
+
+            track = library.get_track(song_id)
+            if track is None:
+                return None
+
+            song_path = os.path.join(favorites_dir, os.path.basename(track["path"]))
+            return song_path if os.path.exists(song_path) else None
+
+        return {song_id: get_synced_path(song_id) for song_id in favorites_ids}
+
     def download_track(self, download_path, prefered_audio_quality, url):
         print(f"Download track: {url} - {download_path}")
 
@@ -439,6 +1217,7 @@ class Downloader:
             prefered_audio_quality=prefered_audio_quality,
             song_data=track_data,
             output_path=tracks_dir,
+            album_dir=song_album_dir,
         )
 
         if result["error"]:
@@ -447,13 +1226,11 @@ class Downloader:
         # Download album cover
         album_cover_id = track_data["ALB_PICTURE"]
         album_cover_file = os.path.join(song_album_dir, "cover.jpg")
-        if not os.path.exists(album_cover_file):
-            utils.download_image(
-                self.client.session,
-                file_output=album_cover_file,
-                pic_type="cover",
-                pic_id=album_cover_id,
-            )
+        self._download_cover(
+            file_output=album_cover_file,
+            pic_type="cover",
+            pic_id=album_cover_id,
+        )
 
         song_file_path_in_tracks = result["output_file_full_path"]
         song_file_name = result["output_file_name"]
@@ -463,12 +1240,11 @@ class Downloader:
         duplicates_links_type = self.client.config.get_value(
             "downloads", "duplicates_link_type"
         )
-        if not os.path.exists(song_file_path_in_album):
-            utils.create_link(
-                src=song_file_path_in_tracks,
-                dest=song_file_path_in_album,
-                link_type=duplicates_links_type,
-            )
+        self._create_link(
+            src=song_file_path_in_tracks,
+            dest=song_file_path_in_album,
+            link_type=duplicates_links_type,
+        )
 
         return {
             "download_name": song_title,
@@ -485,6 +1261,16 @@ class Downloader:
     ):
         print(f"Download album: {url} - {download_path}")
 
+        # Skip albums downloaded completely, without any request
+        album = self._get_library().get_complete_album(utils.extract_id_from_url(url))
+        if album:
+            print(f"Album already downloaded: {album['title']}, skipping")
+            return {
+                "download_name": album["title"],
+                "cover_path": album["cover_path"],
+                "songs_absolute_paths": album["tracks"][-1:],
+            }
+
         if not album_data:
             album_data = self.client.api.get_album_data(url)
 
@@ -547,18 +1333,14 @@ class Downloader:
         # Download album cover
         album_cover_id = songs[0]["ALB_PICTURE"]
         album_cover_file = os.path.join(album_dir, "cover.jpg")
+        self._download_cover(
+            file_output=album_cover_file,
+            pic_type="cover",
+            pic_id=album_cover_id,
+        )
 
-        if not os.path.exists(album_cover_file):
-            utils.download_image(
-                self.client.session,
-                file_output=album_cover_file,
-                pic_type="cover",
-                pic_id=album_cover_id,
-            )
-
-        # Download songs
-        song_file_path_in_album = None
-        for song in songs:
+        # Download one song, returns its path in the album directory
+        def download_album_song(song):
             song_title = song["SNG_TITLE"]
             artist_name = song["ART_NAME"]
 
@@ -577,23 +1359,25 @@ class Downloader:
                     prefered_audio_quality=prefered_audio_quality,
                     song_data=song,
                     output_path=tracks_dir,
+                    album_dir=album_dir,
                 )
 
                 if result["error"]:
                     print(f"Error: {result['message']}. Skipping.")
-                    continue
+                    return None
 
                 song_file_path_in_tracks = result["output_file_full_path"]
                 song_file_name = result["output_file_name"]
                 song_file_path_in_album = os.path.join(album_dir, song_file_name)
 
                 # Create song link from 'Tracks' folder to its album directory
-                if not os.path.exists(song_file_path_in_album):
-                    utils.create_link(
-                        src=song_file_path_in_tracks,
-                        dest=song_file_path_in_album,
-                        link_type=duplicates_links_type,
-                    )
+                self._create_link(
+                    src=song_file_path_in_tracks,
+                    dest=song_file_path_in_album,
+                    link_type=duplicates_links_type,
+                )
+
+                return song_file_path_in_album
 
             # When NOT using links for duplicates
             else:
@@ -602,11 +1386,26 @@ class Downloader:
                     prefered_audio_quality=prefered_audio_quality,
                     song_data=song,
                     output_path=album_dir,
+                    album_dir=album_dir,
                 )
 
                 if result["error"]:
                     print(f"Error: {result['message']}. Skipping.")
-                    continue
+
+                return None
+
+        # Download songs
+        song_file_path_in_album = None
+        for song_path in self._map_songs(download_album_song, songs):
+            if song_path:
+                song_file_path_in_album = song_path
+
+        # Mark the album as complete once all its songs are indexed
+        library = self._get_library()
+        if all(library.get_track(song["SNG_ID"]) for song in songs):
+            library.add_album(
+                album_id, album_name, album_dir, album_cover_file, len(songs)
+            )
 
         return {
             "download_name": album_name,
@@ -621,8 +1420,39 @@ class Downloader:
         url,
         download_to_tracks=True,
         create_m3u=True,
+        playlist_data=None,
     ):
-        playlist_data = self.client.api.get_playlist_data(url)
+        library = self._get_library()
+        previous = library.get_playlist(utils.extract_id_from_url(url))
+        previous_ids = set(previous["sng_ids"]) if previous else set()
+        # Songs synced with the playlist before, the ones which failed are retried
+        synced_ids = previous_ids - set(previous["failed_ids"]) if previous else set()
+
+        if not playlist_data:
+            playlist_infos, unchanged = self._get_playlist_changes(
+                previous, url, download_path, download_to_tracks, create_m3u
+            )
+
+            if unchanged and not previous["failed_ids"]:
+                playlist_name = playlist_infos.get("TITLE")
+                print(f"Playlist unchanged: {playlist_name}, skipping")
+                return {
+                    "download_name": utils.sanitize_replace_slash(playlist_name),
+                    "cover_path": self._get_playlist_paths(
+                        download_path, playlist_name, download_to_tracks, create_m3u
+                    )["picture"],
+                    "songs_absolute_paths": self._get_songs_album_paths(
+                        previous["sng_ids"]
+                    ),
+                }
+
+            if unchanged:
+                playlist_data = self._get_playlist_retry_data(previous, playlist_infos)
+            else:
+                playlist_data = self.client.api.get_playlist_data(
+                    url,
+                    checksum=playlist_infos.get("CHECKSUM") if playlist_infos else None,
+                )
 
         if len(playlist_data["DATA"]) == 0:
             print(f"Error, playlist: {url} looks empty, skipping")
@@ -660,19 +1490,20 @@ class Downloader:
             os.makedirs(playlist_dir, exist_ok=True)
             playlist_picture_of = os.path.join(playlist_dir, "cover.jpg")
 
-            # Save API response
-            api_response_file = os.path.join(playlist_dir, "playlist_data.json")
-            with open(api_response_file, "w") as fo:
-                fo.write(json.dumps(playlist_data, indent=2))
+            # Save API response, a retry only has the data of the failed songs
+            if all("TRACK_TOKEN" in song for song in songs):
+                api_response_file = os.path.join(playlist_dir, "playlist_data.json")
+                with open(api_response_file, "w") as fo:
+                    fo.write(json.dumps(playlist_data, indent=2))
 
         # Save Playlist picture
         playlist_picture_type = playlist_data.get("DATA", {})["PICTURE_TYPE"]
         playlist_picture_id = playlist_data.get("DATA", {})["PLAYLIST_PICTURE"]
-        utils.download_image(
-            self.client.session,
+        self._get_pictures().place(
             file_output=playlist_picture_of,
             pic_type=playlist_picture_type,
             pic_id=playlist_picture_id,
+            size=self._get_picture_size("playlist_picture_size"),
         )
 
         # Create 'Tracks' folder to store all songs if we should use links for duplicates files
@@ -687,12 +1518,21 @@ class Downloader:
         if use_links_for_duplicates:
             os.makedirs(tracks_dir, exist_ok=True)
 
-        # List of downloaded songs for M3U playlist file
-        downloaded_songs_relative_paths = []
-        downloaded_songs_absolute_paths = []
+        # Download one song, returns its (relative, absolute) paths for the M3U playlist file
+        def download_playlist_song(song):
+            # Songs already synced with this playlist only need their M3U entry
+            if song["SNG_ID"] in synced_ids:
+                song_paths = self._get_playlist_synced_paths(
+                    song["SNG_ID"],
+                    download_path,
+                    download_to_tracks,
+                    None if download_to_tracks else playlist_dir,
+                )
+
+                # Songs known only by their SNG_ID cannot be downloaded
+                if song_paths or "TRACK_TOKEN" not in song:
+                    return song_paths
 
-        # Download songs
-        for song in songs:
             song_title = song["SNG_TITLE"]
             artist_name = song["ART_NAME"]
 
@@ -704,38 +1544,7 @@ class Downloader:
                 ""  # Full file name will be returned by the "_download_song" function
             )
 
-            album_infos = self.client.api.get_album_infos(song["ALB_ID"])
-            album_artist = "Unknown"
-
-            if album_infos:
-                if "error" not in album_infos:
-                    if (
-                        album_infos["artist"]["name"] == "Various Artists"
-                        and "label" in album_infos
-                    ):
-                        album_artist = album_infos["label"]
-                    else:
-                        album_artist = album_infos["artist"]["name"]
-
-            album_artist = utils.sanitize_replace_slash(album_artist)
-
-            song_album_dir = os.path.join(
-                download_path, "Library", "Artists", album_artist, song["ALB_TITLE"]
-            )
-
-            # Create song album dir
-            os.makedirs(song_album_dir, exist_ok=True)
-
-            # Download album cover
-            album_cover_id = song["ALB_PICTURE"]
-            album_cover_file = os.path.join(song_album_dir, "cover.jpg")
-            if not os.path.exists(album_cover_file):
-                utils.download_image(
-                    self.client.session,
-                    file_output=album_cover_file,
-                    pic_type="cover",
-                    pic_id=album_cover_id,
-                )
+            song_album_dir = self._get_song_album_dir(download_path, song)
 
             if not download_to_tracks:
                 # When using links for duplicates
@@ -745,11 +1554,12 @@ class Downloader:
                         prefered_audio_quality=prefered_audio_quality,
                         song_data=song,
                         output_path=tracks_dir,
+                        album_dir=song_album_dir,
                     )
 
                     if result["error"]:
                         print(f"Error: {result['message']}. Skipping.")
-                        continue
+                        return None
 
                     song_file_path_in_tracks = result["output_file_full_path"]
                     song_file_name = result["output_file_name"]
@@ -762,20 +1572,18 @@ class Downloader:
                     )
 
                     # Create song link from 'Tracks' directory to its album folder
-                    if not os.path.exists(song_file_path_in_album):
-                        utils.create_link(
-                            src=song_file_path_in_tracks,
-                            dest=song_file_path_in_album,
-                            link_type=duplicates_links_type,
-                        )
+                    self._create_link(
+                        src=song_file_path_in_tracks,
+                        dest=song_file_path_in_album,
+                        link_type=duplicates_links_type,
+                    )
 
                     # Create song link from Tracks folder to its playlist directory
-                    if not os.path.exists(song_file_path_in_playlist):
-                        utils.create_link(
-                            src=song_file_path_in_tracks,
-                            dest=song_file_path_in_playlist,
-                            link_type=duplicates_links_type,
-                        )
+                    self._create_link(
+                        src=song_file_path_in_tracks,
+                        dest=song_file_path_in_playlist,
+                        link_type=duplicates_links_type,
+                    )
 
                 # When NOT using links for duplicates
                 else:
@@ -788,42 +1596,61 @@ class Downloader:
 
                     if result["error"]:
                         print(f"Error: {result['message']}. Skipping.")
-                        continue
+                        return None
 
                 # Add song to M3U playlist
-                downloaded_songs_relative_paths.append(song_file_name)
-                downloaded_songs_absolute_paths.append(song_file_name)
+                return song_file_name, song_file_name
             else:
                 # Download track to 'Tracks' directory
                 result = self._download_song(
                     prefered_audio_quality=prefered_audio_quality,
                     song_data=song,
                     output_path=tracks_dir,
+                    album_dir=song_album_dir,
                 )
 
                 if result["error"]:
                     print(f"Error: {result['message']}. Skipping.")
-                    continue
+                    return None
 
                 song_file_name = result["output_file_name"]
                 song_file_path_in_tracks = result["output_file_full_path"]
                 song_file_path_in_album = os.path.join(song_album_dir, song_file_name)
 
                 # Create song link from its album folder to the 'Tracks' directory
-                if not os.path.exists(song_file_path_in_album):
-                    utils.create_link(
-                        src=song_file_path_in_tracks,
-                        dest=song_file_path_in_album,
-                        link_type=duplicates_links_type,
-                    )
-
-                relative_path_in_tracks = (
-                    f"../Artists/{album_artist}/{song['ALB_TITLE']}/{song_file_name}"
+                self._create_link(
+                    src=song_file_path_in_tracks,
+                    dest=song_file_path_in_album,
+                    link_type=duplicates_links_type,
                 )
 
+                relative_path_in_tracks = os.path.relpath(
+                    song_file_path_in_album,
+                    os.path.join(download_path, "Library", "Playlists"),
+                ).replace(os.sep, "/")
+
                 # Add song to M3U playlist
-                downloaded_songs_relative_paths.append(relative_path_in_tracks)
-                downloaded_songs_absolute_paths.append(song_file_path_in_album)
+                return relative_path_in_tracks, song_file_path_in_album
+
+        # Download songs, lists of downloaded songs for M3U playlist file
+        downloaded_songs_relative_paths = []
+        downloaded_songs_absolute_paths = []
+        failed_ids = []
+
+        for song, song_paths in zip(
+            songs, self._map_songs(download_playlist_song, songs)
+        ):
+            if song_paths:
+                downloaded_songs_relative_paths.append(song_paths[0])
+                downloaded_songs_absolute_paths.append(song_paths[1])
+            else:
+                failed_ids.append(song["SNG_ID"])
+
+        # Links to the songs removed from the playlist since the last sync
+        if not download_to_tracks and use_links_for_duplicates:
+            self._remove_song_links(
+                playlist_dir, previous_ids - {song["SNG_ID"] for song in songs}
+            )
 
         # Generate M3U playlist file
         if create_m3u:
@@ -838,12 +1665,168 @@ class Downloader:
                 songs=downloaded_songs_relative_paths,
             )
 
+        # Remember the playlist state, only the songs which failed are retried
+        # while the playlist does not change
+        library.set_playlist(
+            playlist_id,
+            checksum=playlist_data["DATA"].get("CHECKSUM"),
+            nb_song=song_count,
+            date_mod=playlist_data["DATA"].get("DATE_MOD"),
+            sng_ids=[song["SNG_ID"] for song in songs],
+            failed_ids=failed_ids,
+        )
+
         return {
             "download_name": playlist_name,
             "cover_path": playlist_picture_of,
             "songs_absolute_paths": downloaded_songs_absolute_paths,
         }
 
+    def _get_playlist_paths(
+        self, download_path, playlist_name, download_to_tracks, create_m3u
+    ):
+        """M3U file (None without one), directory and picture of a playlist"""
+        playlist_name = utils.sanitize_replace_slash(playlist_name)
+        playlists_dir = os.path.join(download_path, "Library", "Playlists")
+
+        if download_to_tracks and create_m3u:
+            return {
+                "m3u": os.path.join(playlists_dir, f"{playlist_name}.m3u"),
+                "dir": playlists_dir,
+                "picture": os.path.join(playlists_dir, f"{playlist_name}.jpg"),
+            }
+
+        playlist_dir = os.path.join(playlists_dir, playlist_name)
+        return {
+            "m3u": os.path.join(playlist_dir, f"{playlist_name}.m3u")
+            if create_m3u
+            else None,
+            "dir": playlist_dir,
+            "picture": os.path.join(playlist_dir, "cover.jpg"),
+        }
+
+    def _get_playlist_synced_paths(
+        self, song_id, download_path, download_to_tracks, playlist_dir
+    ):
+        """
+        (M3U entry, path) of a song synced with a playlist before, None if its
+        file is gone. <playlist_dir> is the directory songs are linked or
+        downloaded to, None when they stay in their album directory.
+        """
+        if playlist_dir is None:
+            song_paths = self._get_songs_album_paths([song_id])
+            if not song_paths:
+                return None
+
+            relative_path_in_tracks = os.path.relpath(
+                song_paths[0], os.path.join(download_path, "Library", "Playlists")
+            ).replace(os.sep, "/")
+            return relative_path_in_tracks, song_paths[0]
+
+        track = self._get_library().get_track(song_id)
+        if track is None:
+            return None
+
+        song_file_name = os.path.basename(track["path"])
+        if not os.path.exists(os.path.join(playlist_dir, song_file_name)):
+            return None
+
+        return song_file_name, song_file_name
+
+    def _get_playlist_retry_data(self, previous, playlist_infos):
+        """
+        Data of an unchanged playlist whose failed songs are downloaded again.
+        Only these songs are fetched, the others are known by their SNG_ID.
+        """
+        print(
+            f"Playlist unchanged: {playlist_infos.get('TITLE')}, "
+            f"retrying {len(previous['failed_ids'])} songs"
+        )
+
+        failed_songs = {
+            song["SNG_ID"]: song
+            for song in self.client.api.get_tracks_data(previous["failed_ids"])
+        }
+
+        return {
+            "DATA": playlist_infos,
+            "SONGS": {
+                "data": [
+                    failed_songs.get(song_id, {"SNG_ID": song_id})
+                    for song_id in previous["sng_ids"]
+                ]
+            },
+        }
+
+    def _get_playlist_changes(
+        self, previous, url, download_path, download_to_tracks, create_m3u
+    ):
+        """
+        (DATA block, unchanged) of a playlist. A playlist synced before costs one
+        light request, and can be skipped when it did not change.
+        """
+        if not previous:
+            return None, False
+
+        playlist_infos = self.client.api.get_playlist_infos(url)
+        if not playlist_infos:
+            return None, False
+
+        unchanged = self._is_playlist_unchanged(
+            previous, playlist_infos, download_path, download_to_tracks, create_m3u
+        )
+        return playlist_infos, unchanged
+
+    def _is_playlist_unchanged(
+        self, previous, playlist_infos, download_path, download_to_tracks, create_m3u
+    ):
+        """Compare the state of the last sync of a playlist to its current DATA block"""
+        for key, state_key in (
+            ("CHECKSUM", "checksum"),
+            ("NB_SONG", "nb_song"),
+            ("DATE_MOD", "date_mod"),
+        ):
+            if str(playlist_infos.get(key)) != str(previous[state_key]):
+                return False
+
+        paths = self._get_playlist_paths(
+            download_path, playlist_infos.get("TITLE"), download_to_tracks, create_m3u
+        )
+
+        return os.path.exists(paths["m3u"] or paths["dir"])
+
+    def _remove_song_links(self, directory, song_ids):
+        """Remove the links to the indexed songs from <directory>"""
+        library = self._get_library()
+
+        for song_id in song_ids:
+            track = library.get_track(song_id)
+            if track is None:
+                continue
+
+            link = os.path.join(directory, os.path.basename(track["path"]))
+            if os.path.islink(link) or (
+                os.path.exists(link) and os.path.samefile(link, track["path"])
+            ):
+                print(f"Removed: {link}")
+                os.remove(link)
+
+    def _get_songs_album_paths(self, song_ids):
+        """Paths in their album directory of the indexed songs"""
+        library = self._get_library()
+        song_paths = []
+
+        for song_id in song_ids:
+            track = library.get_track(song_id)
+            if not track or not track["album_path"]:
+                continue
+
+            song_path = os.path.join(track["album_path"], os.path.basename(track["path"]))
+            if os.path.exists(song_path):
+                song_paths.append(song_path)
+
+        return song_paths
+
     def download_from_url(
         self,
         url,
@@ -970,40 +1953,331 @@ class Downloader:
 
         artist_albums = self.client.api.get_all_artist_albums(artist_id)
 
-        if len(artist_albums) == 0:
+        if not artist_albums:
             print(f"No album found for artist: {artist_id}, skipping")
             return
 
-        print("Downloading albums from artist...")
-        for album in artist_albums:
-            album_data = self.client.api.get_album_data(album["id"])
+        artist_albums = self._filter_artist_albums(artist_id, artist_albums)
 
-            # Check if artists IDs match
-            if artist_id == album_data.get("data", [])[0].get("ART_ID"):
-                self.download_album(
-                    download_path,
-                    prefered_audio_quality,
-                    album["id"],
-                    album_data=album_data,
-                )
+        print(f"Downloading {len(artist_albums)} albums from artist...")
+        self._download_albums(
+            download_path,
+            prefered_audio_quality,
+            [(artist_id, album) for album in artist_albums],
+        )
+
+    def _filter_artist_albums(self, artist_id, artist_albums):
+        """
+        Albums of a discography listing to download. Compilations, appearances and
+        albums downloaded completely are left out without requesting their songs.
+        Albums the listing does not tell the artist of are checked by
+        _download_albums on their first song.
+        """
+        library = self._get_library()
+
+        return [
+            album
+            for album in artist_albums
+            if str(album.get("artist_id") or artist_id) == str(artist_id)
+            and not library.get_complete_album(album["id"])
+        ]
+
+    def _download_albums(self, download_path, prefered_audio_quality, artist_albums):
+        """
+        Download albums from (artist ID, album) pairs, their songs lists are
+        requested ahead
+        """
+        for (artist_id, album), album_data in self._prefetch(
+            lambda artist_album: self.client.api.get_album_data(artist_album[1]["id"]),
+            artist_albums,
+        ):
+            if not album_data or not album_data.get("data"):
+                continue
+
+            # Listings without the album artist, check it on the first song
+            if not album.get("artist_id") and str(artist_id) != str(
+                album_data["data"][0].get("ART_ID")
+            ):
+                continue
+
+            self.download_album(
+                download_path,
+                prefered_audio_quality,
+                album["id"],
+                album_data=album_data,
+            )
+
+    def _prefetch(self, function, items):
+        """
+        (item, function(item)) of each item, in order. <function> runs concurrently
+        on the next items, up to 'api.max_workers' at once, while the current one
+        is processed.
+        """
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        max_workers = int(self.client.config.get_value("api", "max_workers", 4))
+        max_workers = max(1, max_workers)
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefetch"
+        ) as executor:
+            pending = deque()
+            items = iter(items)
+
+            while True:
+                # A bounded window of requests ahead, song track tokens expire
+                while len(pending) < max_workers * 2:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    pending.append((item, executor.submit(function, item)))
+
+                if not pending:
+                    return
+
+                item, future = pending.popleft()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error: {e}")
+                    result = None
+
+                yield item, result
 
     def download_all_from_favorite_artists(self, user_id=None):
         if not user_id:
             user_id = self.client.user_data["userId"]
 
+        download_path = self.client.config.get_value("downloads", "music_download_path")
+        prefered_audio_quality = self.client.config.get_value(
+            "deezer", "prefered_audio_quality"
+        )
+
         user_favorite_artists = self.client.api.get_user_favorite_artists(user_id)
 
-        if len(user_favorite_artists) == 0:
+        if not user_favorite_artists:
             print(f"User {user_id} dont have any favorite artist !")
             return
 
         print(f"Found {len(user_favorite_artists)} artists, downloading...")
 
-        for artist in user_favorite_artists:
-            print(f"Downloading all from artist {artist['id']}")
-            self.download_all_from_artist(artist["id"])
+        # Albums listed by several artists are downloaded once
+        seen_albums = set()
+
+        # Discographies are listed concurrently, ahead of the albums downloaded
+        def iter_albums():
+            for artist, artist_albums in self._prefetch(
+                lambda artist: self.client.api.get_all_artist_albums(artist["id"]),
+                user_favorite_artists,
+            ):
+                albums = [
+                    album
+                    for album in self._filter_artist_albums(
+                        artist["id"], artist_albums or []
+                    )
+                    if album["id"] not in seen_albums
+                ]
+                print(f"Artist {artist['name']}: {len(albums)} albums to download")
+
+                for album in albums:
+                    seen_albums.add(album["id"])
+                    yield artist["id"], album
+
+        # Songs in several albums are downloaded once for the whole run
+        self._remember_songs = True
+        try:
+            self._download_albums(download_path, prefered_audio_quality, iter_albums())
+        finally:
+            self._remember_songs = False
+            self._planned_songs = {}
 
     def download_all(self):
-        self.download_all_albums()
-        self.download_favorites()
-        self.download_all_playlists()
+        """
+        Download the saved albums, the favorites and the playlists.
+        All of them are listed first, so a song in several of them is downloaded
+        once, then the album, favorites and playlist views are made from it.
+        The track tokens that expired while listing are refreshed by chunks, just
+        before their songs are downloaded.
+        """
+        download_path = self.client.config.get_value("downloads", "music_download_path")
+        prefered_audio_quality = self.client.config.get_value(
+            "deezer", "prefered_audio_quality"
+        )
+
+        plan = self._plan_download_all(download_path)
+
+        try:
+            print(f"Downloading {len(plan['songs'])} songs...")
+            self._download_planned_songs(
+                download_path, prefered_audio_quality, list(plan["songs"].values())
+            )
+
+            for album_id, album_data in plan["albums"]:
+                self.download_album(
+                    download_path,
+                    prefered_audio_quality,
+                    album_id,
+                    album_data=album_data,
+                )
+
+            if plan["favorites_ids"]:
+                self.download_favorites(
+                    favorites_ids=plan["favorites_ids"],
+                    favorites_tracks=plan["favorites_tracks"],
+                )
+
+            for playlist_id, playlist_data in plan["playlists"]:
+                self.download_playlist(
+                    download_path,
+                    prefered_audio_quality,
+                    playlist_id,
+                    playlist_data=playlist_data,
+                )
+        finally:
+            self._planned_songs = {}
+
+    def _plan_download_all(self, download_path):
+        """
+        Data of the albums, favorites and playlists to sync, and 'songs', the
+        songs to download, by SNG_ID. Albums, favorites and playlists unchanged
+        since their last sync are left out.
+        """
+        user_id = self.client.user_data["userId"]
+        library = self._get_library()
+        use_links_for_duplicates = self.client.config.get_value(
+            "downloads", "use_links_for_duplicates"
+        )
+        plan = {
+            "songs": {},
+            "albums": [],
+            "favorites_ids": None,
+            "favorites_tracks": {},
+            "playlists": [],
+        }
+
+        print("Listing saved albums...")
+        for album in self.client.api.get_user_albums(user_id):
+            if library.get_complete_album(album["id"]):
+                continue
+
+            album_data = self.client.api.get_album_data(album["id"])
+            if not album_data:
+                continue
+
+            plan["albums"].append((album["id"], album_data))
+
+            # Without links, album songs are copies in their album directory
+            if use_links_for_duplicates:
+                for song in album_data.get("data", []):
+                    plan["songs"].setdefault(song["SNG_ID"], song)
+
+        print("Listing favorites...")
+        favorites_ids = self.client.api.get_user_favorites_ids(user_id)
+        if favorites_ids:
+            plan["favorites_ids"] = favorites_ids
+            synced_paths = self._get_favorites_synced_paths(
+                user_id, favorites_ids, download_path, True
+            )
+            added_ids = [i for i in favorites_ids if not synced_paths[i]]
+
+            # Songs listed by the albums need no data request
+            for song_id in added_ids:
+                if song_id in plan["songs"]:
+                    plan["favorites_tracks"][song_id] = plan["songs"][song_id]
+
+            missing_ids = [i for i in added_ids if i not in plan["favorites_tracks"]]
+            for tracks in self.client.api.iter_tracks_data(missing_ids):
+                for song in tracks:
+                    plan["favorites_tracks"][song["SNG_ID"]] = song
+                    plan["songs"].setdefault(song["SNG_ID"], song)
+
+        print("Listing playlists...")
+        for playlist in self.client.api.get_user_playlists(user_id):
+            previous = library.get_playlist(playlist["id"])
+            playlist_infos, unchanged = self._get_playlist_changes(
+                previous, playlist["id"], download_path, True, True
+            )
+
+            if unchanged and not previous["failed_ids"]:
+                print(f"Playlist unchanged: {playlist_infos.get('TITLE')}, skipping")
+                continue
+
+            if unchanged:
+                playlist_data = self._get_playlist_retry_data(previous, playlist_infos)
+            else:
+                playlist_data = self.client.api.get_playlist_data(
+                    playlist["id"],
+                    checksum=playlist_infos.get("CHECKSUM") if playlist_infos else None,
+                )
+            if not playlist_data:
+                continue
+
+            plan["playlists"].append((playlist["id"], playlist_data))
+
+            # Songs synced with the playlist before only need their M3U entry
+            synced_ids = (
+                set(previous["sng_ids"]) - set(previous["failed_ids"])
+                if previous
+                else set()
+            )
+            for song in playlist_data.get("SONGS", {}).get("data", []):
+                # Known only by their SNG_ID
+                if "TRACK_TOKEN" not in song:
+                    continue
+
+                if song["SNG_ID"] in synced_ids and self._get_songs_album_paths(
+                    [song["SNG_ID"]]
+                ):
+                    continue
+
+                plan["songs"].setdefault(song["SNG_ID"], song)
+
+        return plan
+
+    def _download_planned_songs(self, download_path, prefered_audio_quality, songs):
+        """
+        Download songs to the 'Tracks' directory, linked from their album
+        directory, and remember them for the rest of the run
+        """
+        duplicates_links_type = self.client.config.get_value(
+            "downloads", "duplicates_link_type"
+        )
+        tracks_dir = os.path.join(download_path, "Tracks")
+        os.makedirs(tracks_dir, exist_ok=True)
+
+        def download_planned_song(song):
+            song_title = song["SNG_TITLE"]
+            artist_name = song["ART_NAME"]
+
+            print(
+                f"Downloading song: {utils.get_song_filename(artist_name, song_title)}"
+            )
+
+            song_album_dir = self._get_song_album_dir(download_path, song)
+
+            result = self._download_song(
+                prefered_audio_quality=prefered_audio_quality,
+                song_data=song,
+                output_path=tracks_dir,
+                album_dir=song_album_dir,
+            )
+
+            if result["error"]:
+                print(f"Error: {result['message']}. Skipping.")
+                return
+
+            # Create song link from 'Tracks' directory to its album folder
+            self._create_link(
+                src=result["output_file_full_path"],
+                dest=os.path.join(song_album_dir, result["output_file_name"]),
+                link_type=duplicates_links_type,
+            )
+
+            self._planned_songs[song["SNG_ID"]] = {
+                "output_path": tracks_dir,
+                "album_dir": song_album_dir,
+                "result": result,
+            }
+
+        self._map_songs(download_planned_song, songs)
@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+LIBRARY_INDEX_FILE_NAME = ".deezer-dl-library.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    sng_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    format TEXT,
+    quality TEXT,
+    size INTEGER,
+    isrc TEXT,
+    alb_id TEXT,
+    checksum TEXT,
+    album_path TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS tracks_alb_id ON tracks (alb_id);
+CREATE INDEX IF NOT EXISTS tracks_path ON tracks (path);
+CREATE INDEX IF NOT EXISTS tracks_album_path ON tracks (album_path);
+CREATE TABLE IF NOT EXISTS albums (
+    alb_id TEXT PRIMARY KEY,
+    title TEXT,
+    path TEXT,
+    cover_path TEXT,
+    track_count INTEGER,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    playlist_id TEXT PRIMARY KEY,
+    checksum TEXT,
+    nb_song INTEGER,
+    date_mod TEXT,
+    sng_ids TEXT,
+    failed_ids TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS favorites (
+    user_id TEXT PRIMARY KEY,
+    sng_ids TEXT,
+    failed_ids TEXT,
+    updated_at REAL
+);
+"""
+
+# Columns added to the tables of existing indexes: (table, column, type)
+ADDED_COLUMNS = (
+    ("playlists", "failed_ids", "TEXT"),
+    ("favorites", "failed_ids", "TEXT"),
+)
+
+TRACK_COLUMNS = (
+    "sng_id",
+    "path",
+    "format",
+    "quality",
+    "size",
+    "isrc",
+    "alb_id",
+    "checksum",
+    "album_path",
+)
+
+
+def file_checksum(file_path):
+    """SHA-1 of a file, read by chunks"""
+    h = hashlib.sha1()
+
+    with open(file_path, "rb") as f:
+        while data := f.read(1024 * 1024):
+            h.update(data)
+
+    return h.hexdigest()
+
+
+class ChecksumWriter:
+    """
+    File object computing the file_checksum of what is written to it, so a file
+    written from its start is not read again. Other calls go to the file.
+    """
+
+    def __init__(self, fo):
+        self.fo = fo
+        self.sha1 = hashlib.sha1()
+
+    def write(self, data):
+        self.sha1.update(data)
+        return self.fo.write(data)
+
+    def hexdigest(self):
+        return self.sha1.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self.fo, name)
+
+
+class LibraryIndex:
+    """
+    SQLite index of the songs downloaded to a music directory, keyed by SNG_ID.
+    It lives in the music directory, paths are stored relative to it, so the
+    library can be moved. Entries are only trusted while their file exists.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.root = os.path.dirname(os.path.abspath(db_path))
+        # Songs are downloaded from several threads, they share one connection
+        self.lock = threading.Lock()
+
+        os.makedirs(self.root, exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(SCHEMA)
+            self._add_columns()
+
+    def _add_columns(self):
+        """Bring an index created by an older version to the current schema"""
+        for table, column, column_type in ADDED_COLUMNS:
+            columns = [
+                row["name"]
+                for row in self.connection.execute(f"PRAGMA table_info({table})")
+            ]
+            if column not in columns:
+                self.connection.execute(
+                    f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"
+                )
+
+    def _to_db_path(self, path):
+        if path is None:
+            return None
+
+        path = os.path.abspath(path)
+        if os.path.commonpath([path, self.root]) == self.root:
+            return os.path.relpath(path, self.root)
+
+        return path
+
+    def _from_db_path(self, path):
+        if path is None:
+            return None
+
+        return os.path.join(self.root, path)
+
+    def _track_from_row(self, row):
+        track = dict(row)
+        track["path"] = self._from_db_path(track["path"])
+        track["album_path"] = self._from_db_path(track["album_path"])
+        return track
+
+    def get_track(self, sng_id):
+        """Indexed song whose file is still on disk, or None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM tracks WHERE sng_id = ?", (str(sng_id),)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        track = self._track_from_row(row)
+        if not os.path.exists(track["path"]):
+            return None
+
+        return track
+
+    def find_track(self, path):
+        """
+        Indexed song of a file, the song file itself or its copy in the album
+        directory, or None. The file does not need to be readable as a song.
+        """
+        path = os.path.abspath(path)
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM tracks WHERE path = ?", (self._to_db_path(path),)
+            ).fetchone()
+
+            if row is None:
+                rows = self.connection.execute(
+                    "SELECT * FROM tracks WHERE album_path = ?",
+                    (self._to_db_path(os.path.dirname(path)),),
+                ).fetchall()
+                row = next(
+                    (
+                        row
+                        for row in rows
+                        if os.path.basename(row["path"]) == os.path.basename(path)
+                    ),
+                    None,
+                )
+
+        return None if row is None else self._track_from_row(row)
+
+    def add_track(self, track):
+        """Insert or replace a song, <track> has the keys of TRACK_COLUMNS"""
+        values = dict.fromkeys(TRACK_COLUMNS)
+        values.update(track)
+        values["sng_id"] = str(values["sng_id"])
+        values["path"] = self._to_db_path(values["path"])
+        values["album_path"] = self._to_db_path(values["album_path"])
+
+        with self.lock, self.connection:
+            columns = ", ".join(TRACK_COLUMNS + ("updated_at",))
+            placeholders = ", ".join("?" * (len(TRACK_COLUMNS) + 1))
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO tracks ({columns}) VALUES ({placeholders})",
+                [values[column] for column in TRACK_COLUMNS] + [time.time()],
+            )
+
+    def add_album(self, alb_id, title, path, cover_path, track_count):
+        """Mark an album as completely downloaded"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO albums "
+                "(alb_id, title, path, cover_path, track_count, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    str(alb_id),
+                    title,
+                    self._to_db_path(path),
+                    self._to_db_path(cover_path),
+                    track_count,
+                    time.time(),
+                ),
+            )
+
+    def get_complete_album(self, alb_id):
+        """
+        Album marked as complete whose songs are all still on disk, or None.
+        Its 'tracks' are the paths of its songs in the album directory.
+        """
+        with self.lock:
+            album = self.connection.execute(
+                "SELECT * FROM albums WHERE alb_id = ?", (str(alb_id),)
+            ).fetchone()
+            rows = self.connection.execute(
+                "SELECT * FROM tracks WHERE alb_id = ?", (str(alb_id),)
+            ).fetchall()
+
+        if album is None or len(rows) < album["track_count"]:
+            return None
+
+        album = dict(album)
+        album["path"] = self._from_db_path(album["path"])
+        album["cover_path"] = self._from_db_path(album["cover_path"])
+        album["tracks"] = []
+
+        for row in rows:
+            track = self._track_from_row(row)
+            if not os.path.exists(track["path"]):
+                return None
+
+            album["tracks"].append(
+                os.path.join(album["path"], os.path.basename(track["path"]))
+            )
+
+        return album
+
+    def get_playlist(self, playlist_id):
+        """
+        State of a playlist at its last sync, or None. 'sng_ids' are all its
+        songs, in order, 'failed_ids' the ones which could not be downloaded.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM playlists WHERE playlist_id = ?", (str(playlist_id),)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        playlist = dict(row)
+        playlist["sng_ids"] = json.loads(playlist["sng_ids"])
+        playlist["failed_ids"] = json.loads(playlist["failed_ids"] or "[]")
+        return playlist
+
+    def set_playlist(
+        self, playlist_id, checksum, nb_song, date_mod, sng_ids, failed_ids=()
+    ):
+        """Record the state of a playlist once synced, with the songs that failed"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO playlists "
+                "(playlist_id, checksum, nb_song, date_mod, sng_ids, failed_ids, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(playlist_id),
+                    checksum,
+                    nb_song,
+                    date_mod,
+                    json.dumps([str(sng_id) for sng_id in sng_ids]),
+                    json.dumps([str(sng_id) for sng_id in failed_ids]),
+                    time.time(),
+                ),
+            )
+
+    def get_favorites(self, user_id):
+        """Favorite song IDs of a user synced at the last sync, or None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT sng_ids FROM favorites WHERE user_id = ?", (str(user_id),)
+            ).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def get_failed_favorites(self, user_id):
+        """Favorite song IDs of a user which could not be downloaded at the last sync"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT failed_ids FROM favorites WHERE user_id = ?", (str(user_id),)
+            ).fetchone()
+
+        return json.loads(row[0]) if row and row[0] else []
+
+    def set_favorites(self, user_id, sng_ids, failed_ids=()):
+        """Record the favorites synced, and the ones which failed"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO favorites "
+                "(user_id, sng_ids, failed_ids, updated_at) VALUES (?, ?, ?, ?)",
+                (
+                    str(user_id),
+                    json.dumps([str(sng_id) for sng_id in sng_ids]),
+                    json.dumps([str(sng_id) for sng_id in failed_ids]),
+                    time.time(),
+                ),
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Items asked per page, the public API may send fewer
+PUBLIC_API_PAGE_SIZE = 1000
+GW_LIGHT_PAGE_SIZE = 500
+
+
+class Paginator:
+    """
+    Items of a paginated listing, yielded in order.
+    The first page tells the total number of items, the remaining pages are then
+    fetched concurrently by up to <max_workers> threads.
+    fetch_page(offset, count) returns (items, total), total being None if the
+    listing does not tell it, or None on error.
+    After an error, iteration stops and 'error' is set.
+    """
+
+    def __init__(self, fetch_page, page_size, max_workers=4):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_workers = max(1, max_workers)
+        self.error = False
+
+    def _fetch_page(self, offset, count):
+        """fetch_page(), with exceptions reported as a failed page"""
+        try:
+            return self.fetch_page(offset, count)
+        except Exception as e:
+            print(f"Error: could not fetch a page: {e}")
+            return None
+
+    def __iter__(self):
+        self.error = False
+
+        page = self._fetch_page(0, self.page_size)
+        if page is None:
+            self.error = True
+            return
+
+        items, total = page
+        yield from items
+
+        if not items:
+            return
+
+        # Without a total, follow the pages one by one until a short one
+        if total is None:
+            yield from self._iter_sequential(len(items))
+            return
+
+        # The server may cap the page size, use the one it answered with
+        page_size = min(self.page_size, len(items))
+        offsets = range(len(items), int(total), page_size)
+
+        if not offsets:
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="paginator"
+        ) as executor:
+            futures = [
+                executor.submit(self._fetch_page, offset, page_size)
+                for offset in offsets
+            ]
+
+            for future in futures:
+                page = future.result()
+
+                if page is None:
+                    self.error = True
+                    for pending in futures:
+                        pending.cancel()
+                    return
+
+                yield from page[0]
+
+    def _iter_sequential(self, offset):
+        page_size = offset
+
+        while True:
+            page = self._fetch_page(offset, page_size)
+            if page is None:
+                self.error = True
+                return
+
+            items = page[0]
+            yield from items
+
+            if len(items) < page_size:
+                return
+
+            offset += len(items)
+
+    def get_all(self):
+        """List of all the items, or None on error"""
+        items = list(self)
+        return None if self.error else items
+
+
+def public_api_pages(session, url):
+    """fetch_page of an api.deezer.com listing, paged with index/limit"""
+    separator = "&" if "?" in url else "?"
+
+    def fetch_page(offset, count):
+        response = session.get(f"{url}{separator}index={offset}&limit={count}")
+        json_data = response.json()
+
+        if "error" in json_data:
+            print(f"Error: deezer API response: {json_data['error']}")
+            return None
+
+        return json_data.get("data", []), json_data.get("total")
+
+    return fetch_page
+
+
+def gw_light_pages(client, method, payload):
+    """fetch_page of a gw-light listing, paged with start/nb"""
+
+    def fetch_page(offset, count):
+        response = client.request_api(
+            request_type="POST",
+            method=method,
+            json_data={**payload, "start": offset, "nb": count},
+        )
+
+        # request_api returns None on HTTP and API errors
+        if response is None:
+            return None
+
+        if response.get("error"):
+            print(f"Error: deezer API response: {response['error']}")
+            return None
+
+        results = response["results"]
+        return results.get("data", []), results.get("total")
+
+    return fetch_page
@@ -0,0 +1,177 @@
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+import deezer.songutils as songutils
+
+PICTURE_STORE_DIR_NAME = ".deezer-dl-pictures"
+# Linux ioctl cloning a file, for copy-on-write filesystems (btrfs, xfs)
+FICLONE = 0x40049409
+
+
+def clone_file(src, dest):
+    """
+    Place a copy of <src> at <dest> without copying its data when possible:
+    a reflink, else a hardlink, else a plain copy.
+    """
+    try:
+        import fcntl
+
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+            fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+        return
+    except (ImportError, OSError):
+        if os.path.exists(dest):
+            os.remove(dest)
+
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class PictureStore:
+    """
+    Pictures of the Deezer image CDN, fetched once per library.
+    On disk, pictures are stored by the SHA-1 of their content, and refs map a
+    (pic_type, pic_id, size) key to its content. Recently used pictures are kept
+    in memory, up to <memory_max_bytes>.
+    Without <store_dir>, pictures are only kept in memory.
+    """
+
+    def __init__(self, session, store_dir=None, memory_max_bytes=32 * 1024 * 1024):
+        self.session = session
+        self.store_dir = store_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.lock = threading.Lock()
+        # One fetch per picture, even with songs of the same album downloaded at once
+        self.key_locks = {}
+
+    def _get_key_lock(self, key):
+        with self.lock:
+            if key not in self.key_locks:
+                self.key_locks[key] = threading.Lock()
+            return self.key_locks[key]
+
+    def _ref_path(self, key):
+        pic_type, pic_id, size = key
+        return os.path.join(self.store_dir, "refs", pic_type, f"{pic_id}-{size}")
+
+    def _object_path(self, digest):
+        return os.path.join(self.store_dir, "objects", digest[:2], f"{digest}.jpg")
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remember(self, key, picture):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return
+
+            self.memory[key] = picture
+            self.memory_size += len(picture)
+
+            while self.memory_size > self.memory_max_bytes and len(self.memory) > 1:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_size -= len(evicted)
+
+    def _get_object(self, key):
+        """Path of the stored picture of <key>, or None"""
+        if not self.store_dir:
+            return None
+
+        try:
+            with open(self._ref_path(key), "r") as f:
+                object_path = self._object_path(f.read().strip())
+        except OSError:
+            return None
+
+        return object_path if os.path.exists(object_path) else None
+
+    def _store(self, key, picture):
+        """Store a picture under its content hash, returns its path"""
+        digest = hashlib.sha1(picture).hexdigest()
+        object_path = self._object_path(digest)
+
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, picture)
+        self._write_atomic(self._ref_path(key), digest.encode())
+
+        return object_path
+
+    def _fetch(self, key):
+        pic_type, pic_id, size = key
+        response = self.session.get(songutils.get_picture_link(pic_type, pic_id, size))
+
+        if response.status_code != 200 or not response.content:
+            print(f"Error {response.status_code}: Could not download picture {pic_id}")
+            return None
+
+        return response.content
+
+    def get_picture(self, pic_type, pic_id, size=songutils.DEFAULT_PICTURE_SIZE):
+        """Picture bytes, from memory, the disk or the CDN. None if it could not be fetched."""
+        key = (pic_type, str(pic_id), int(size))
+
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+        with self._get_key_lock(key):
+            object_path = self._get_object(key)
+
+            if object_path:
+                with open(object_path, "rb") as f:
+                    picture = f.read()
+            else:
+                picture = self._fetch(key)
+                if picture is None:
+                    return None
+
+                if self.store_dir:
+                    self._store(key, picture)
+
+        self._remember(key, picture)
+        return picture
+
+    def place(self, file_output, pic_type, pic_id, size=songutils.DEFAULT_PICTURE_SIZE):
+        """
+        Write a picture to <file_output>, replacing it. With a store directory on
+        the same filesystem, the file shares its data with the stored picture.
+        Returns False if the picture could not be fetched.
+        """
+        key = (pic_type, str(pic_id), int(size))
+        object_path = self._get_object(key)
+
+        if not object_path:
+            picture = self.get_picture(pic_type, pic_id, size)
+            if picture is None:
+                return False
+
+            object_path = self._get_object(key)
+
+            # Memory only store
+            if not object_path:
+                self._write_atomic(file_output, picture)
+                return True
+
+        # Already linked, renaming a hardlink over itself would be a no-op
+        if os.path.exists(file_output) and os.path.samefile(object_path, file_output):
+            return True
+
+        tmp_path = f"{file_output}.{threading.get_ident()}.tmp"
+        clone_file(object_path, tmp_path)
+        os.replace(tmp_path, file_output)
+
+        return True
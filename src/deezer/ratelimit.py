@@ -0,0 +1,453 @@
+import json
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Requests per second and burst size, by endpoint family.
+# The public API allows 50 requests every 5 seconds: a burst of 10 then 8 per
+# second stays within it over any 5 seconds.
+DEFAULT_LIMITS = {
+    "gw-light": {"rate": 10, "burst": 20},
+    "public-api": {"rate": 8, "burst": 10},
+    "media": {"rate": 5, "burst": 10},
+    "cdn": {"rate": 50, "burst": 100},
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Error code of the public API replies sent once the quota is exhausted
+QUOTA_EXCEEDED_CODE = 4
+
+# Requests in flight by endpoint family: starting, lowest and highest limits
+DEFAULT_CONCURRENCY = {
+    "gw-light": {"initial": 4, "min": 1, "max": 16},
+    "public-api": {"initial": 4, "min": 1, "max": 16},
+    "media": {"initial": 2, "min": 1, "max": 8},
+    "cdn": {"initial": 4, "min": 1, "max": 32},
+}
+# Families whose requests wait for a permit. With 'auto' jobs, the Downloader
+# holds a 'cdn' permit for a whole song instead, its cover is fetched meanwhile.
+REQUEST_GATED_FAMILIES = ("gw-light", "public-api", "media")
+
+
+def get_endpoint_family(url):
+    """Endpoint family of a Deezer URL: 'gw-light', 'public-api', 'media', 'cdn' or 'other'"""
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+
+    if parsed.path.endswith("gw-light.php"):
+        return "gw-light"
+    if host == "api.deezer.com":
+        return "public-api"
+    if host == "media.deezer.com":
+        return "media"
+    if host.endswith("dzcdn.net"):
+        return "cdn"
+
+    return "other"
+
+
+def get_response_status(family, status, content):
+    """
+    HTTP status of a response for retries. The public API reports an exhausted
+    quota as a 200 with error code 4, it is handled as a 429.
+    """
+    if family != "public-api" or status != 200:
+        return status
+
+    if not content or not content.lstrip().startswith(b'{"error"'):
+        return status
+
+    try:
+        error = json.loads(content)["error"]
+    except (ValueError, KeyError, TypeError):
+        return status
+
+    if isinstance(error, dict) and error.get("code") == QUOTA_EXCEEDED_CODE:
+        return 429
+
+    return status
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header, in seconds or as an HTTP date"""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    <rate> tokens per second, up to <burst>. reserve() takes a token and returns
+    how long to wait before using it, so callers sleep the way they need to.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        if self.rate <= 0:
+            return 0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            self.tokens -= 1
+
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            return max(wait, self.paused_until - now)
+
+    def pause(self, seconds):
+        """Hold every request of the bucket, after a 429 response"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class ConcurrencyController:
+    """
+    AIMD limit of the requests in flight, by endpoint family. The limit grows by
+    one for every <limit> healthy responses, and is multiplied by <decrease_factor>
+    on a throttled (RETRY_STATUSES) or failed request, or a latency over
+    <latency_spike_factor> times the usual one, at most once a second.
+    """
+
+    def __init__(self, limits=None, decrease_factor=0.5, latency_spike_factor=3.0):
+        self.decrease_factor = decrease_factor
+        self.latency_spike_factor = latency_spike_factor
+        self.condition = threading.Condition()
+        self.families = {}
+
+        all_limits = {
+            family: dict(limit) for family, limit in DEFAULT_CONCURRENCY.items()
+        }
+        for family, limit in (limits or {}).items():
+            all_limits.setdefault(family, {}).update(limit)
+
+        for family, limit in all_limits.items():
+            min_limit = max(1, int(limit.get("min", 1)))
+            max_limit = max(min_limit, int(limit.get("max", min_limit)))
+            initial = int(limit.get("initial", min_limit))
+            initial = min(max_limit, max(min_limit, initial))
+
+            self.families[family] = {
+                "limit": float(initial),
+                "min": min_limit,
+                "max": max_limit,
+                "in_flight": 0,
+                # Moving average of the latency, in seconds
+                "latency": None,
+                "decreased_at": 0,
+                "samples": 0,
+                "decreases": 0,
+                "peak_limit": initial,
+            }
+
+    def get_limit(self, family):
+        with self.condition:
+            state = self.families.get(family)
+            return int(state["limit"]) if state else None
+
+    def get_max_limit(self, family):
+        state = self.families.get(family)
+        return state["max"] if state else None
+
+    def acquire(self, family):
+        """Wait for a permit of <family>, False if the family has no limit"""
+        state = self.families.get(family)
+        if state is None:
+            return False
+
+        with self.condition:
+            while state["in_flight"] >= int(state["limit"]):
+                self.condition.wait()
+            state["in_flight"] += 1
+
+        return True
+
+    def release(self, family):
+        with self.condition:
+            self.families[family]["in_flight"] -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def permit(self, family):
+        acquired = self.acquire(family)
+        try:
+            yield
+        finally:
+            if acquired:
+                self.release(family)
+
+    def observe(self, family, latency=None, status=None, error=False):
+        """Adjust the limit of <family> from the outcome of one of its requests"""
+        state = self.families.get(family)
+        if state is None:
+            return
+
+        with self.condition:
+            now = time.monotonic()
+            average = state["latency"]
+            state["samples"] += 1
+
+            spike = (
+                latency is not None
+                and average is not None
+                and latency > average * self.latency_spike_factor
+            )
+
+            if latency is not None:
+                average = latency if average is None else 0.9 * average + 0.1 * latency
+                state["latency"] = average
+
+            # Multiplicative decrease, once for the requests sent at the same rate
+            if error or status in RETRY_STATUSES or spike:
+                if now - state["decreased_at"] >= 1.0:
+                    state["limit"] = max(
+                        state["min"], state["limit"] * self.decrease_factor
+                    )
+                    state["decreased_at"] = now
+                    state["decreases"] += 1
+                return
+
+            # Additive increase
+            previous_limit = int(state["limit"])
+            state["limit"] = min(state["max"], state["limit"] + 1 / state["limit"])
+            state["peak_limit"] = max(state["peak_limit"], int(state["limit"]))
+
+            if int(state["limit"]) > previous_limit:
+                self.condition.notify_all()
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                family: {
+                    "limit": int(state["limit"]),
+                    "peak_limit": state["peak_limit"],
+                    "decreases": state["decreases"],
+                    "latency": state["latency"],
+                }
+                for family, state in self.families.items()
+                if state["samples"]
+            }
+
+    def print_stats(self):
+        stats = self.get_stats()
+
+        if not stats:
+            return
+
+        families = ", ".join(
+            f"{family} {s['limit']} "
+            f"(peak {s['peak_limit']}, {s['decreases']} decreases)"
+            for family, s in stats.items()
+        )
+        print(f"Concurrency: {families}")
+
+
+class RateLimiter:
+    """
+    Token bucket per endpoint family, shared by every session of the client.
+    Requests failing with a connection error or a RETRY_STATUSES status are
+    retried up to <max_retries> times, after an exponential backoff with jitter
+    or the delay of their Retry-After header.
+    Each request outcome feeds <concurrency>, and the requests of
+    REQUEST_GATED_FAMILIES wait for one of its permits.
+    """
+
+    def __init__(
+        self,
+        limits=None,
+        max_retries=5,
+        backoff_base=1.0,
+        backoff_max=60.0,
+        concurrency=None,
+    ):
+        self.limits = {family: dict(limit) for family, limit in DEFAULT_LIMITS.items()}
+        for family, limit in (limits or {}).items():
+            self.limits.setdefault(family, {}).update(limit)
+
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.buckets = {
+            family: TokenBucket(limit.get("rate", 0), limit.get("burst", 1))
+            for family, limit in self.limits.items()
+        }
+        self.concurrency = concurrency or ConcurrencyController()
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def _count(self, family, counter, value=1):
+        with self.lock:
+            family_stats = self.stats.setdefault(
+                family,
+                {
+                    "requests": 0,
+                    "retries": 0,
+                    "failures": 0,
+                    "throttled_seconds": 0.0,
+                    "backoff_seconds": 0.0,
+                },
+            )
+            family_stats[counter] += value
+
+    def _reserve(self, family):
+        bucket = self.buckets.get(family)
+        wait = bucket.reserve() if bucket else 0
+
+        self._count(family, "requests")
+        if wait > 0:
+            self._count(family, "throttled_seconds", wait)
+
+        return wait
+
+    def _get_retry_delay(self, family, attempt, status=None, retry_after=None):
+        """Seconds to wait before retrying, or None when the request is done"""
+        if status is not None and status not in RETRY_STATUSES:
+            return None
+
+        if attempt >= self.max_retries:
+            self._count(family, "failures")
+            return None
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            backoff = min(self.backoff_max, self.backoff_base * 2**attempt)
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+
+        # Too many requests, slow down every request of the family
+        if status == 429 and family in self.buckets:
+            self.buckets[family].pause(delay)
+
+        self._count(family, "retries")
+        self._count(family, "backoff_seconds", delay)
+        return delay
+
+    def send(self, url, request, retry_exceptions=()):
+        """
+        requests.Response of request(), rate limited and retried.
+        Raises the last exception when connection errors exhaust the retries.
+        """
+        family = get_endpoint_family(url)
+        attempt = 0
+
+        while True:
+            time.sleep(self._reserve(family))
+
+            gated = family in REQUEST_GATED_FAMILIES and self.concurrency.acquire(
+                family
+            )
+            started_at = time.monotonic()
+
+            try:
+                response = request()
+            except retry_exceptions:
+                self.concurrency.observe(family, error=True)
+                delay = self._get_retry_delay(family, attempt)
+                if delay is None:
+                    raise
+            else:
+                # Streamed responses are not read here, only public API ones are
+                status = get_response_status(
+                    family,
+                    response.status_code,
+                    response.content if family == "public-api" else None,
+                )
+                self.concurrency.observe(
+                    family, time.monotonic() - started_at, status
+                )
+                delay = self._get_retry_delay(
+                    family, attempt, status, response.headers.get("Retry-After")
+                )
+                if delay is None:
+                    return response
+
+                response.close()
+            finally:
+                if gated:
+                    self.concurrency.release(family)
+
+            time.sleep(delay)
+            attempt += 1
+
+    async def async_send(self, url, request, retry_exceptions=()):
+        """
+        Same as send(), for an aiohttp request coroutine factory. Requests are
+        not gated, waiting for a permit would block the event loop, but their
+        outcome still adjusts the concurrency limits.
+        """
+        family = get_endpoint_family(url)
+        attempt = 0
+
+        while True:
+            await asyncio.sleep(self._reserve(family))
+            started_at = time.monotonic()
+
+            try:
+                response = await request()
+            except retry_exceptions:
+                self.concurrency.observe(family, error=True)
+                delay = self._get_retry_delay(family, attempt)
+                if delay is None:
+                    raise
+            else:
+                # aiohttp keeps the body once read, callers can read it again
+                status = get_response_status(
+                    family,
+                    response.status,
+                    await response.read() if family == "public-api" else None,
+                )
+                self.concurrency.observe(
+                    family, time.monotonic() - started_at, status
+                )
+                delay = self._get_retry_delay(
+                    family, attempt, status, response.headers.get("Retry-After")
+                )
+                if delay is None:
+                    return response
+
+                response.release()
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {family: dict(stats) for family, stats in self.stats.items()}
+
+    def print_stats(self):
+        stats = self.get_stats()
+
+        retries = sum(s["retries"] for s in stats.values())
+        failures = sum(s["failures"] for s in stats.values())
+        waited = sum(
+            s["throttled_seconds"] + s["backoff_seconds"] for s in stats.values()
+        )
+
+        if not retries and not waited:
+            return
+
+        print(
+            f"Rate limiting: {retries} retries, {failures} failures, "
+            f"{waited:.1f}s waiting"
+        )
@@ -0,0 +1,190 @@
+import os
+import re
+import mmap
+import struct
+
+import deezer.crypto as crypto
+import deezer.songutils as songutils
+
+AUDIO_FILE_EXTENSIONS = (".mp3", ".flac")
+ID3V1_TAG_SIZE = 128
+
+
+def get_audio_bounds(data):
+    """Return (start, end) of the audio stream, without the ID3v2 and ID3v1 tags"""
+    start = songutils.get_id3v2_tag_size(data[:10])
+    end = len(data)
+
+    id3v1_start = end - ID3V1_TAG_SIZE
+    if id3v1_start >= start and data[id3v1_start : id3v1_start + 3] == b"TAG":
+        end = id3v1_start
+
+    return min(start, end), end
+
+
+def is_audio_header(data):
+    """Check if <data> starts like a FLAC stream or a MPEG audio frame"""
+    if data[:4] == b"fLaC":
+        return True
+
+    return len(data) >= 2 and data[0] == 0xFF and (data[1] & 0xE0) == 0xE0
+
+
+def get_song_id_from_tags(data):
+    """Read the Deezer song ID from the TXXX frame written by songutils.writeid3v2"""
+    if data[:3] != b"ID3":
+        return None
+
+    tag_end, _ = get_audio_bounds(data)
+    offset = 10
+
+    while offset + 10 <= tag_end:
+        frame_id, frame_size = struct.unpack(">4sL", data[offset : offset + 8])
+
+        # Reached padding
+        if frame_id[:1] == b"\0":
+            break
+
+        content = bytes(data[offset + 10 : offset + 10 + frame_size])
+        offset += 10 + frame_size
+
+        if frame_id != b"TXXX":
+            continue
+
+        description, _, value = content[1:].partition(b"\0")
+        if description.decode(errors="ignore") == songutils.SNG_ID_TAG_DESCRIPTION:
+            value = value.decode(errors="ignore").strip("\0")
+            return value if value.isdigit() else None
+
+    return None
+
+
+def get_song_id_from_filename(file_path):
+    """Files named after their song ID: '<id>.mp3' or 'Artist - Title [<id>].mp3'"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+
+    match = re.search(r"(?:^(\d+)$|\[(\d+)\]$)", stem.strip())
+    if not match:
+        return None
+
+    return match.group(1) or match.group(2)
+
+
+def find_song_id(file_path, data, library=None):
+    """Song ID of a file from the library index, its tags, or its file name"""
+    if library is not None:
+        track = library.find_track(file_path)
+        if track:
+            return track["sng_id"]
+
+    song_id = get_song_id_from_tags(data)
+
+    if not song_id:
+        song_id = get_song_id_from_filename(file_path)
+
+    return song_id
+
+
+def decrypt_file_in_place(file_path, library=None):
+    """
+    Decrypt a still encrypted song file on disk, without any network access.
+    The file is memory-mapped and its stripes are decrypted in place.
+    <library> is the LibraryIndex of the music directory, if there is one.
+    """
+    with open(file_path, "r+b") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {"error": True, "message": "Empty file"}
+
+        with mmap.mmap(f.fileno(), 0) as data:
+            start, end = get_audio_bounds(data)
+
+            if end - start < crypto.STRIPE_SIZE:
+                return {"error": True, "message": "No audio stream found"}
+
+            if is_audio_header(data[start : start + 4]):
+                return {"error": False, "decrypted": False}
+
+            song_id = find_song_id(file_path, data, library)
+            if not song_id:
+                return {"error": True, "message": "Could not find the song ID"}
+
+            decryptor = crypto.StripeDecryptor(crypto.calcbfkey(song_id))
+
+            # Check the key on a copy of the first stripe before touching the file
+            first_stripe = bytearray(data[start : start + crypto.STRIPE_SIZE])
+            decryptor.decrypt_stripe(memoryview(first_stripe))
+            if not is_audio_header(first_stripe):
+                return {
+                    "error": True,
+                    "message": f"Not a valid audio stream once decrypted with song ID {song_id}",
+                }
+
+            audio = memoryview(data)[start:end]
+            try:
+                crypto.decrypt_stripes(decryptor, audio)
+            finally:
+                audio.release()
+
+            data.flush()
+
+    return {"error": False, "decrypted": True, "song_id": song_id}
+
+
+def find_audio_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for file_name in sorted(files):
+                    if file_name.lower().endswith(AUDIO_FILE_EXTENSIONS):
+                        file_path = os.path.join(root, file_name)
+
+                        # Songs linked from the 'Tracks' directory are handled once
+                        if not os.path.islink(file_path):
+                            yield file_path
+        else:
+            yield path
+
+
+def decrypt_paths(paths, workers=1, library=None):
+    """Find and decrypt still encrypted song files in the given files and directory trees"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def repair(file_path):
+        try:
+            return file_path, decrypt_file_in_place(file_path, library)
+        except OSError as e:
+            return file_path, {"error": True, "message": str(e)}
+
+    # Hardlinks share their data, decrypt them only once
+    seen_inodes = set()
+    files = []
+    for file_path in find_audio_files(paths):
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            print(f"Error: {file_path}: {e}")
+            continue
+
+        if (stat.st_dev, stat.st_ino) in seen_inodes:
+            continue
+
+        seen_inodes.add((stat.st_dev, stat.st_ino))
+        files.append(file_path)
+
+    print(f"Checking {len(files)} files...")
+
+    decrypted_count = 0
+    error_count = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for file_path, result in executor.map(repair, files):
+            if result["error"]:
+                error_count += 1
+                print(f"Error: {file_path}: {result['message']}")
+            elif result["decrypted"]:
+                decrypted_count += 1
+                print(f"Decrypted: {file_path}")
+
+    print(f"\nDone! {decrypted_count} files decrypted, {error_count} errors.")
+
+    return {"decrypted": decrypted_count, "errors": error_count}
@@ -2,6 +2,11 @@ import struct
 
 from deezer.crypto import md5hex, hexaescrypt
 
+# Description of the TXXX frame holding the Deezer song ID
+SNG_ID_TAG_DESCRIPTION = "DEEZER_SNG_ID"
+# Width and height of the pictures requested to the image CDN
+DEFAULT_PICTURE_SIZE = 1200
+
 
 def genurlkey(songid, md5origin, mediaver=4, fmt=1):
     """Calculate the deezer download url given the songid, origin and media+format"""
@@ -53,31 +58,16 @@ def writeid3v1_1(fo, song):
     fo.write(data)
 
 
-downloaded_pictures_cache = {}
-
-
-def download_picture_bytes(session, pic_type, pic_id):
-    global downloaded_pictures_cache
-
-    # Clear cache
-    if len(downloaded_pictures_cache) > 100:
-        downloaded_pictures_cache = {}
-
-    # Cache album pictures
-    if pic_id not in downloaded_pictures_cache:
-        res = session.get(get_picture_link(pic_type, pic_id))
-        picture_bytes = res.content
-        downloaded_pictures_cache.update({pic_id: picture_bytes})
-
-    return downloaded_pictures_cache[pic_id]
-
-
-def get_picture_link(pic_type, pic_id):
+def get_picture_link(pic_type, pic_id, size=DEFAULT_PICTURE_SIZE):
     setting_domain_img = "https://cdn-images.dzcdn.net/images"
-    return f"{setting_domain_img}/{pic_type}/{pic_id}/1200x1200.jpg"
+    return f"{setting_domain_img}/{pic_type}/{pic_id}/{size}x{size}.jpg"
 
 
-def writeid3v2(session, fo, song):
+def writeid3v2(pictures, fo, song, cover_size=DEFAULT_PICTURE_SIZE):
+    """
+    Write the ID3v2 tag of <song>, its cover comes from the <pictures> PictureStore.
+    <cover_size> is the width and height of the embedded cover.
+    """
     def make28bit(x):
         return (
             ((x << 3) & 0x7F000000)
@@ -196,6 +186,9 @@ def writeid3v2(session, fo, song):
             "TSIZ", makeutf8(str(FileSize))
         ),  # The 'Size' frame contains the size of the audiofile in bytes, excluding the ID3v2 tag, represented as a numeric string.
         maketag("TFLT", makeutf8("MPG/3")),
+        maketag(
+            "TXXX", makeutf8(f"{SNG_ID_TAG_DESCRIPTION}\0{song_get(song, 'SNG_ID')}")
+        ),  # User defined text frame, keeps the Deezer song ID so files can be decrypted offline
     ]  # decimal, no term NUL
     id3.extend(
         [
@@ -230,16 +223,13 @@ def writeid3v2(session, fo, song):
     )
 
     try:
-        id3.append(
-            maketag(
-                "APIC",
-                makepic(
-                    download_picture_bytes(
-                        session, pic_type="cover", pic_id=song["ALB_PICTURE"]
-                    )
-                ),
-            )
+        picture = pictures.get_picture(
+            pic_type="cover", pic_id=song["ALB_PICTURE"], size=cover_size
         )
+        if picture is None:
+            print("ERROR: no album cover")
+        else:
+            id3.append(maketag("APIC", makepic(picture)))
     except Exception as e:
         print("ERROR: no album cover?", e)
 
@@ -262,6 +252,20 @@ def writeid3v2(session, fo, song):
     fo.write(id3data)
 
 
+def get_id3v2_tag_size(data):
+    """Size of the ID3v2 tag <data> starts with, header included. 0 if there is none."""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+
+    size = data[6:10]
+    return 10 + (
+        (size[0] & 0x7F) << 21
+        | (size[1] & 0x7F) << 14
+        | (size[2] & 0x7F) << 7
+        | (size[3] & 0x7F)
+    )
+
+
 def generate_playlist_m3u(playlist_dir, playlist_name, songs):
     import os
 
@@ -0,0 +1,110 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from deezer.ratelimit import RateLimiter
+
+# (connect, read) seconds, the read timeout applies to each socket read of a stream
+DEFAULT_TIMEOUT = (10, 60)
+
+
+class RateLimitedSession(requests.Session):
+    """
+    requests.Session sending its requests through a RateLimiter.
+    Requests without a timeout get <timeout>, so that a stalled connection
+    raises a Timeout which the limiter retries.
+    """
+
+    def __init__(self, limiter, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.limiter = limiter
+        self.timeout = timeout
+
+    def request(self, method, url, *args, **kwargs):
+        # timeout is the 7th argument after the url, unless given by keyword
+        if len(args) < 7:
+            kwargs.setdefault("timeout", self.timeout)
+
+        return self.limiter.send(
+            url,
+            lambda: super(RateLimitedSession, self).request(
+                method, url, *args, **kwargs
+            ),
+            retry_exceptions=(
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ),
+        )
+
+
+class Transport:
+    """
+    HTTP sessions shared by the whole client, with per-host keep-alive
+    connection pools.
+    'session' is authenticated and used for the Deezer website and APIs,
+    'media_session' has no cookies and is used for the media API, the CDN
+    and the pictures.
+    Both share one RateLimiter, which retries failed requests.
+    """
+
+    def __init__(self, pool_connections=50, pool_maxsize=32, limiter=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.limiter = limiter or RateLimiter()
+        self.session = self._new_session()
+        self.media_session = self._new_session()
+
+    def _new_session(self):
+        session = RateLimitedSession(self.limiter)
+
+        # One pool of up to <pool_maxsize> connections per host, for <pool_connections> hosts
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        return session
+
+    def _get_pools(self):
+        for session in (self.session, self.media_session):
+            # Sessions replaced by the async engine have no connection pools
+            if not isinstance(session, requests.Session):
+                continue
+
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        yield pool
+
+    def get_stats(self):
+        """Requests sent, and how many of them needed a new connection (TCP + TLS handshake)"""
+        hosts = {}
+
+        for pool in self._get_pools():
+            host = hosts.setdefault(pool.host, {"requests": 0, "new_connections": 0})
+            host["requests"] += pool.num_requests
+            host["new_connections"] += pool.num_connections
+
+        requests_count = sum(host["requests"] for host in hosts.values())
+        new_connections = sum(host["new_connections"] for host in hosts.values())
+
+        return {
+            "requests": requests_count,
+            "new_connections": new_connections,
+            "reused_connections": max(0, requests_count - new_connections),
+            "hosts": hosts,
+        }
+
+    def print_stats(self):
+        stats = self.get_stats()
+
+        if not stats["requests"]:
+            return
+
+        print(
+            f"HTTP: {stats['requests']} requests, {stats['new_connections']} new connections, "
+            f"{stats['reused_connections']} reused connections"
+        )
@@ -69,19 +69,6 @@ def extract_id_from_url(url):
         return None
 
 
-def download_image(session, file_output, pic_type, pic_id):
-    from deezer.songutils import download_picture_bytes
-
-    with open(file_output, "wb") as of:
-        of.write(
-            download_picture_bytes(
-                session,
-                pic_type,
-                pic_id,
-            )
-        )
-
-
 def write_to_file(output_dir, file_name, data):
     import os
 
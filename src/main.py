@@ -18,11 +18,66 @@ def check_requirements():
         exit(1)
 
 
+def parse_options(argv):
+    """Remove the options from the arguments list, returns (arguments, options)"""
+    arguments = []
+    options = {"jobs": None, "engine": "requests"}
+
+    i = 0
+    while i < len(argv):
+        argument = argv[i]
+
+        if argument == "--jobs" or argument == "-j":
+            if i + 1 >= len(argv):
+                print(f"Error: {argument} requires a number")
+                exit(1)
+            options["jobs"] = argv[i + 1]
+            i += 2
+            continue
+
+        if argument.startswith("--jobs="):
+            options["jobs"] = argument.split("=", 1)[1]
+            i += 1
+            continue
+
+        if argument == "--engine":
+            if i + 1 >= len(argv):
+                print(f"Error: {argument} requires an engine name")
+                exit(1)
+            options["engine"] = argv[i + 1]
+            i += 2
+            continue
+
+        if argument.startswith("--engine="):
+            options["engine"] = argument.split("=", 1)[1]
+            i += 1
+            continue
+
+        arguments.append(argument)
+        i += 1
+
+    if options["jobs"] is not None and options["jobs"] != "auto":
+        if not options["jobs"].isdigit() or int(options["jobs"]) < 1:
+            print(f"Error: invalid number of jobs: {options['jobs']}")
+            exit(1)
+        options["jobs"] = int(options["jobs"])
+
+    if options["engine"] not in ("requests", "async"):
+        print(f"Error: unknown engine: {options['engine']}")
+        exit(1)
+
+    return arguments, options
+
+
 def print_help():
-    print("""Usage: deezer-dl <argument>
+    print("""Usage: deezer-dl [options] <argument>
 
 Download Music from Deezer
 
+options:
+  -j, --jobs <n|auto>                    Number of songs downloaded at the same time, 'auto' adapts it (default: downloads.max_workers)
+  --engine <requests|async>              HTTP engine, 'async' sends the requests through aiohttp (default: requests)
+
 arguments:
   url <url>                              URL of a Deezer track, album or playlist 
   favorites                              Download favorites tracks from user in config file
@@ -31,15 +86,20 @@ arguments:
   all-albums                             Download all albums of the configured user
   all-from-artist <artist id or url>     Download all songs and albums from given artist
   all-from-favorite-artists [user id]    Download all songs and albums from favorite artists of the specified user or configured user
-  export-all-user-data [user id]         Export all user data as json files: favorite tracks, playlists, saved albums, favorite artists""")
+  export-all-user-data [user id]         Export all user data as json files: favorite tracks, playlists, saved albums, favorite artists
+  decrypt <path...>                      Decrypt still encrypted song files or directory trees, without network access
+  benchmark [baseline json]              Run the hot path benchmarks, fail if slower than the given previous results""")
 
 
 def main():
     # Check system requirements
     check_requirements()
 
+    # Options can be anywhere in the command line
+    sys.argv, options = parse_options(sys.argv)
+
     # Print help message if no arguments provided
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
+    if len(sys.argv) < 2:
         print_help()
         exit(1)
 
@@ -49,8 +109,63 @@ def main():
     # Load config
     cm = ConfigManager(CONFIG_FILE_PATH)
 
+    # Offline subcommands, no Deezer session needed
+    if subcommand == "decrypt":
+        from deezer.repair import decrypt_paths
+
+        if len(sys.argv) < 3:
+            print("Please provide at least one file or directory")
+            exit(1)
+
+        from deezer.library import LibraryIndex, LIBRARY_INDEX_FILE_NAME
+
+        workers = cm.get_value(
+            "downloads", "parallel_decrypt_workers", os.cpu_count() or 1
+        )
+
+        # Song IDs are looked up in the library index first, when there is one
+        library = None
+        library_file = os.path.join(
+            cm.get_value("downloads", "music_download_path"), LIBRARY_INDEX_FILE_NAME
+        )
+        if os.path.exists(library_file):
+            library = LibraryIndex(library_file)
+
+        result = decrypt_paths(sys.argv[2:], workers=int(workers), library=library)
+        exit(1 if result["errors"] else 0)
+
+    if subcommand == "benchmark":
+        import time
+        import deezer.benchmark as benchmark
+
+        if len(sys.argv) > 3:
+            print_help()
+            exit(1)
+
+        output_file = os.path.join(
+            os.path.dirname(CONFIG_FILE_PATH),
+            "benchmarks",
+            f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json",
+        )
+        threshold_percent = cm.get_value(
+            "benchmark", "regression_threshold_percent", 20
+        )
+        success = benchmark.main(
+            output_file,
+            baseline_file=sys.argv[2] if len(sys.argv) == 3 else None,
+            threshold_percent=float(threshold_percent),
+        )
+        exit(0 if success else 1)
+
+    if len(sys.argv) > 3:
+        print_help()
+        exit(1)
+
     # Init Deezer session
-    dc = DeezerClient(config_manager=cm)
+    dc = DeezerClient(config_manager=cm, engine=options["engine"])
+
+    if options["jobs"]:
+        dc.get_downloader().max_workers = options["jobs"]
 
     # Subcommand
     match subcommand:
@@ -108,6 +223,12 @@ def main():
             print("Error: invalid sub-command")
             exit(1)
 
+    # Connection reuse, rate limiting and API cache counters
+    dc.transport.print_stats()
+    dc.transport.limiter.print_stats()
+    dc.transport.limiter.concurrency.print_stats()
+    dc.api.cache.print_stats()
+
 
 if __name__ == "__main__":
     main()
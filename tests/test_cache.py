@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+import deezer.cache as cache
+from deezer.cache import ResponseCache, TRACK_TOKEN_MARGIN
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    response_cache = ResponseCache(
+        db_path=str(tmp_path / "cache.db"), ttls={"album_data": 3600}
+    )
+    yield response_cache
+    response_cache.close()
+
+
+class Fetch:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.response
+
+
+def album_data(token_expire):
+    return {"data": [{"SNG_ID": "1", "TRACK_TOKEN_EXPIRE": int(token_expire)}]}
+
+
+def test_get_track_tokens_expiry():
+    response = {"data": [{"TRACK_TOKEN_EXPIRE": 300}, {"TRACK_TOKEN_EXPIRE": "200"}]}
+
+    assert cache.get_track_tokens_expiry(response) == 200
+    assert cache.get_track_tokens_expiry({"data": []}) is None
+
+
+def test_cached_until_the_ttl(response_cache, clock):
+    fetch = Fetch({"data": []})
+
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    clock[0] += 3500
+    assert response_cache.get_or_fetch("album_data", "1", fetch) == {"data": []}
+    assert fetch.calls == 1
+
+    clock[0] += 200
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    assert fetch.calls == 2
+
+
+def test_expires_before_the_track_tokens(response_cache, clock):
+    fetch = Fetch(album_data(clock[0] + 1800))
+
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    clock[0] += 1800 - TRACK_TOKEN_MARGIN - 10
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    assert fetch.calls == 1
+
+    clock[0] += 20
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    assert fetch.calls == 2
+
+
+def test_almost_expired_track_tokens_are_not_cached(response_cache, clock):
+    fetch = Fetch(album_data(clock[0] + TRACK_TOKEN_MARGIN / 2))
+
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    assert fetch.calls == 2
+
+
+def test_errors_are_not_cached(response_cache):
+    fetch = Fetch({"error": {"code": 800}})
+
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    response_cache.get_or_fetch("album_data", "1", fetch)
+    assert fetch.calls == 2
@@ -0,0 +1,67 @@
+import pytest
+
+import deezer.ratelimit as ratelimit
+from deezer.ratelimit import ConcurrencyController
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_concurrency_additive_increase(clock):
+    controller = ConcurrencyController({"media": {"initial": 4, "min": 1, "max": 5}})
+
+    # About <limit> healthy responses per step
+    for _ in range(4):
+        controller.observe("media", latency=0.1, status=200)
+    assert controller.get_limit("media") == 4
+    controller.observe("media", latency=0.1, status=200)
+    assert controller.get_limit("media") == 5
+
+    for _ in range(20):
+        controller.observe("media", latency=0.1, status=200)
+    assert controller.get_limit("media") == 5
+
+
+def test_concurrency_multiplicative_decrease(clock):
+    controller = ConcurrencyController({"media": {"initial": 8, "min": 1, "max": 8}})
+
+    controller.observe("media", status=429)
+    assert controller.get_limit("media") == 4
+
+    # Once for the requests throttled at the same time
+    controller.observe("media", status=503)
+    controller.observe("media", error=True)
+    assert controller.get_limit("media") == 4
+
+    clock[0] += 1
+    controller.observe("media", error=True)
+    assert controller.get_limit("media") == 2
+
+    for _ in range(5):
+        clock[0] += 1
+        controller.observe("media", status=429)
+    assert controller.get_limit("media") == 1
+
+
+def test_concurrency_latency_spike(clock):
+    controller = ConcurrencyController({"media": {"initial": 8, "min": 1, "max": 16}})
+
+    controller.observe("media", latency=0.1, status=200)
+    controller.observe("media", latency=1.0, status=200)
+    assert controller.get_limit("media") == 4
+
+
+def test_concurrency_permits():
+    controller = ConcurrencyController({"media": {"initial": 2}})
+
+    assert controller.acquire("media")
+    assert controller.acquire("media")
+    assert controller.families["media"]["in_flight"] == 2
+
+    controller.release("media")
+    assert controller.families["media"]["in_flight"] == 1
+    assert not controller.acquire("other")
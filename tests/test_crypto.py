@@ -0,0 +1,79 @@
+import io
+import os
+import random
+
+import pytest
+
+import deezer.crypto as crypto
+from deezer.benchmark import BENCHMARK_SONG_ID
+
+KEY = crypto.calcbfkey(BENCHMARK_SONG_ID)
+# Several parallel buffers of 4 workers, then a trailing partial stripe
+DATA_SIZE = 700 * crypto.STRIPE_GROUP_SIZE + 1000
+
+
+class IrregularResponse:
+    """Response whose chunks ignore the requested size, as a slow network gives"""
+
+    def __init__(self, content, seed=0):
+        self.content = content
+        self.random = random.Random(seed)
+
+    def iter_content(self, chunk_size):
+        offset = 0
+        while offset < len(self.content):
+            size = self.random.choice((1, 7, 2047, 2049, 6144, 65537))
+            yield self.content[offset : offset + size]
+            offset += size
+
+
+def reference_decrypt(data, first_stripe=0):
+    """Every third whole stripe decrypted on its own with blowfishDecrypt"""
+    output = bytearray(data)
+
+    for offset in range(0, len(data) - crypto.STRIPE_SIZE + 1, crypto.STRIPE_SIZE):
+        if (first_stripe + offset // crypto.STRIPE_SIZE) % 3 == 0:
+            stripe = slice(offset, offset + crypto.STRIPE_SIZE)
+            output[stripe] = crypto.blowfishDecrypt(data[stripe], KEY)
+
+    return bytes(output)
+
+
+@pytest.fixture(scope="module")
+def data():
+    return os.urandom(DATA_SIZE)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+@pytest.mark.parametrize("first_stripe", [0, 1, 5])
+def test_decryptfile_matches_blowfish_decrypt(data, workers, first_stripe):
+    fo = io.BytesIO()
+
+    crypto.decryptfile(
+        IrregularResponse(data),
+        KEY,
+        fo,
+        workers=workers,
+        chunk_size=10000,
+        first_stripe=first_stripe,
+    )
+
+    assert fo.getvalue() == reference_decrypt(data, first_stripe)
+
+
+def test_trailing_partial_stripe_is_left_as_is(data):
+    fo = io.BytesIO()
+
+    crypto.decryptfile(IrregularResponse(data), KEY, fo)
+
+    assert fo.getvalue()[-1000:] == data[-1000:]
+
+
+def test_parallel_decryptors_share_one_pool():
+    with crypto.ParallelStripeDecryptor(KEY, 4) as first:
+        pass
+
+    with crypto.ParallelStripeDecryptor(KEY, 8) as second:
+        assert second.executor is first.executor
+        # Still usable after the first song closed its decryptor
+        second.decrypt(memoryview(bytearray(crypto.STRIPE_GROUP_SIZE * 8)))
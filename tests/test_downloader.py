@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from deezer.benchmark import make_benchmark_downloader
+
+
+class FakeApi:
+    """song.getListData returning fresh track tokens"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_tracks_data(self, track_ids):
+        self.calls.append(list(track_ids))
+        return [fresh_song(sng_id) for sng_id in track_ids]
+
+
+def fresh_song(sng_id):
+    return {
+        "SNG_ID": sng_id,
+        "TRACK_TOKEN": f"fresh-{sng_id}",
+        "TRACK_TOKEN_EXPIRE": int(time.time()) + 3600,
+    }
+
+
+def song(sng_id, expires_in):
+    return {
+        "SNG_ID": sng_id,
+        "TRACK_TOKEN": f"token-{sng_id}",
+        "TRACK_TOKEN_EXPIRE": int(time.time()) + expires_in,
+    }
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    downloader = make_benchmark_downloader(str(tmp_path), "http://localhost/", 1024)
+    downloader.client.config.values["api"] = {"tracks_chunk_size": 2}
+    downloader.client.api = FakeApi()
+    return downloader
+
+
+def test_expiring_track_tokens_are_refreshed_by_chunk(downloader):
+    songs = [song("1", 3600), song("2", 60), song("3", 60), song("4", -60)]
+
+    tokens = downloader._map_songs(lambda song: song["TRACK_TOKEN"], songs)
+
+    assert tokens == ["token-1", "fresh-2", "fresh-3", "fresh-4"]
+    assert downloader.client.api.calls == [["2"], ["3", "4"]]
+
+
+def test_songs_without_expiry_are_not_refreshed(downloader):
+    songs = [{"SNG_ID": "1", "TRACK_TOKEN": "token-1"}, {"SNG_ID": "2"}]
+
+    assert downloader._map_songs(lambda song: song, songs) == songs
+    assert downloader.client.api.calls == []
+
+
+def test_fresh_download_url_of_an_expired_token(downloader):
+    requested = []
+
+    def request_songs_download_infos(track_tokens, prefered_audio_quality):
+        requested.extend(track_tokens)
+        return {token: {"format": "MP3_320", "url": token} for token in track_tokens}
+
+    downloader._request_songs_download_infos = request_songs_download_infos
+
+    url = downloader._get_fresh_download_url(song("1", -60), None, "MP3_320")
+
+    assert url == "fresh-1"
+    assert requested == ["fresh-1"]
+
+
+@pytest.mark.parametrize("jobs, in_flight", [(8, 0), ("auto", 1)])
+def test_cdn_permit_only_with_auto_jobs(downloader, jobs, in_flight):
+    downloader.max_workers = jobs
+    cdn = downloader._get_concurrency().families["cdn"]
+
+    with downloader._get_cdn_permit():
+        assert cdn["in_flight"] == in_flight
+
+
+def test_only_songs_to_download_are_queued(downloader, tmp_path):
+    song_file = tmp_path / "Tracks" / "song.mp3"
+    song_file.parent.mkdir()
+    song_file.write_bytes(b"ID3")
+    downloader._get_library().add_track({"sng_id": "1", "path": str(song_file)})
+    fallback = {"SNG_ID": "3", "TRACK_TOKEN": "token-3"}
+    songs = [song("1", 3600), {**song("2", 3600), "FALLBACK": fallback}]
+
+    downloader._queue_songs_download_infos(songs)
+
+    assert list(downloader._media_queue) == ["token-2"]
@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+from deezer.library import LibraryIndex, LIBRARY_INDEX_FILE_NAME
+
+
+@pytest.fixture
+def library(tmp_path):
+    library = LibraryIndex(str(tmp_path / LIBRARY_INDEX_FILE_NAME))
+    yield library
+    library.close()
+
+
+def add_song(library, root, sng_id, alb_id="1", album_dir="Album"):
+    song_file = root / "Tracks" / f"Song {sng_id}.flac"
+    song_file.parent.mkdir(exist_ok=True)
+    song_file.write_bytes(b"fLaC")
+
+    library.add_track(
+        {
+            "sng_id": sng_id,
+            "path": str(song_file),
+            "format": "flac",
+            "alb_id": alb_id,
+            "album_path": str(root / album_dir),
+        }
+    )
+    return song_file
+
+
+def test_get_track(library, tmp_path):
+    song_file = add_song(library, tmp_path, "10")
+
+    track = library.get_track(10)
+    assert track["sng_id"] == "10"
+    assert track["path"] == str(song_file)
+    assert track["album_path"] == str(tmp_path / "Album")
+    assert library.get_track("11") is None
+
+
+def test_get_track_with_missing_file(library, tmp_path):
+    os.remove(add_song(library, tmp_path, "10"))
+
+    assert library.get_track("10") is None
+
+
+def test_paths_are_relative_to_the_library(library, tmp_path):
+    add_song(library, tmp_path, "10")
+
+    row = library.connection.execute(
+        "SELECT path, album_path FROM tracks WHERE sng_id = '10'"
+    ).fetchone()
+    assert tuple(row) == (os.path.join("Tracks", "Song 10.flac"), "Album")
+
+
+def test_find_track(library, tmp_path):
+    song_file = add_song(library, tmp_path, "10")
+
+    assert library.find_track(str(song_file))["sng_id"] == "10"
+    # Copy or link of the song in its album directory
+    album_song_file = tmp_path / "Album" / "Song 10.flac"
+    assert library.find_track(str(album_song_file))["sng_id"] == "10"
+    assert library.find_track(str(tmp_path / "Album" / "Song 11.flac")) is None
+
+
+def test_complete_album(library, tmp_path):
+    for sng_id in ("10", "11"):
+        add_song(library, tmp_path, sng_id)
+    library.add_album("1", "Album", str(tmp_path / "Album"), None, 2)
+
+    album = library.get_complete_album("1")
+    assert album["path"] == str(tmp_path / "Album")
+    assert sorted(album["tracks"]) == [
+        str(tmp_path / "Album" / "Song 10.flac"),
+        str(tmp_path / "Album" / "Song 11.flac"),
+    ]
+
+
+def test_album_missing_a_song(library, tmp_path):
+    add_song(library, tmp_path, "10")
+    library.add_album("1", "Album", str(tmp_path / "Album"), None, 2)
+
+    assert library.get_complete_album("1") is None
+
+
+def test_album_with_a_deleted_song(library, tmp_path):
+    add_song(library, tmp_path, "10")
+    os.remove(add_song(library, tmp_path, "11"))
+    library.add_album("1", "Album", str(tmp_path / "Album"), None, 2)
+
+    assert library.get_complete_album("1") is None
+
+
+def test_playlist_state(library):
+    library.set_playlist("9", "c1", 3, "d1", ["1", "2", "3"], failed_ids=["2"])
+
+    playlist = library.get_playlist("9")
+    assert playlist["sng_ids"] == ["1", "2", "3"]
+    assert playlist["failed_ids"] == ["2"]
+    assert library.get_playlist("10") is None
+
+
+def test_favorites_state(library):
+    library.set_favorites("1", ["10", "11"], failed_ids=["12"])
+
+    assert library.get_favorites("1") == ["10", "11"]
+    assert library.get_failed_favorites("1") == ["12"]
+    assert library.get_favorites("2") is None
+    assert library.get_failed_favorites("2") == []
+
+
+def test_older_index_gets_the_new_columns(tmp_path):
+    import sqlite3
+
+    db_path = str(tmp_path / LIBRARY_INDEX_FILE_NAME)
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE playlists (playlist_id TEXT PRIMARY KEY, checksum TEXT, "
+        "nb_song INTEGER, date_mod TEXT, sng_ids TEXT, updated_at REAL)"
+    )
+    connection.execute(
+        "INSERT INTO playlists VALUES ('9', 'c1', 1, 'd1', '[\"1\"]', 0)"
+    )
+    connection.execute(
+        "CREATE TABLE favorites (user_id TEXT PRIMARY KEY, sng_ids TEXT, "
+        "updated_at REAL)"
+    )
+    connection.execute("INSERT INTO favorites VALUES ('1', '[\"10\"]', 0)")
+    connection.commit()
+    connection.close()
+
+    library = LibraryIndex(db_path)
+    assert library.get_playlist("9")["failed_ids"] == []
+    assert library.get_failed_favorites("1") == []
+    library.close()
@@ -0,0 +1,69 @@
+from deezer.pagination import Paginator, gw_light_pages
+
+
+def make_fetch_page(total, failed_offsets=(), report_total=True, raises=False):
+    calls = []
+
+    def fetch_page(offset, count):
+        calls.append(offset)
+
+        if offset in failed_offsets:
+            if raises:
+                raise ConnectionError("connection reset")
+            return None
+
+        items = list(range(offset, min(offset + count, total)))
+        return items, total if report_total else None
+
+    return fetch_page, calls
+
+
+def test_all_pages():
+    fetch_page, calls = make_fetch_page(25)
+    paginator = Paginator(fetch_page, page_size=10)
+
+    assert paginator.get_all() == list(range(25))
+    assert not paginator.error
+    assert sorted(calls) == [0, 10, 20]
+
+
+def test_pages_without_total():
+    fetch_page, _ = make_fetch_page(25, report_total=False)
+
+    assert Paginator(fetch_page, page_size=10).get_all() == list(range(25))
+
+
+def test_failed_first_page():
+    fetch_page, _ = make_fetch_page(25, failed_offsets=(0,))
+    paginator = Paginator(fetch_page, page_size=10)
+
+    assert paginator.get_all() is None
+    assert paginator.error
+
+
+def test_failed_page():
+    fetch_page, _ = make_fetch_page(45, failed_offsets=(20,))
+    paginator = Paginator(fetch_page, page_size=10)
+
+    # Items before the failed page are yielded, then iteration stops
+    assert list(paginator) == list(range(20))
+    assert paginator.error
+    assert paginator.get_all() is None
+
+
+def test_page_raising_an_exception():
+    fetch_page, _ = make_fetch_page(25, failed_offsets=(10,), raises=True)
+    paginator = Paginator(fetch_page, page_size=10)
+
+    assert paginator.get_all() is None
+    assert paginator.error
+
+
+def test_gw_light_page_without_response():
+    class Client:
+        def request_api(self, **kwargs):
+            return None
+
+    fetch_page = gw_light_pages(Client(), "song.getListData", {})
+
+    assert Paginator(fetch_page, page_size=10).get_all() is None
@@ -0,0 +1,92 @@
+import pytest
+
+import deezer.ratelimit as ratelimit
+from deezer.ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+class Response:
+    def __init__(self, status_code=200, content=b"{}", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+def test_bucket_burst(clock):
+    bucket = TokenBucket(rate=8, burst=10)
+
+    assert [bucket.reserve() for _ in range(10)] == [0] * 10
+    assert bucket.reserve() == pytest.approx(1 / 8)
+    assert bucket.reserve() == pytest.approx(2 / 8)
+
+
+def test_bucket_refill(clock):
+    bucket = TokenBucket(rate=8, burst=10)
+    for _ in range(10):
+        bucket.reserve()
+
+    clock[0] += 0.5
+    assert [bucket.reserve() for _ in range(4)] == [0] * 4
+    assert bucket.reserve() == pytest.approx(1 / 8)
+
+
+def test_bucket_stays_within_the_public_api_quota(clock):
+    limit = ratelimit.DEFAULT_LIMITS["public-api"]
+    bucket = TokenBucket(limit["rate"], limit["burst"])
+
+    # Send each request once its wait is over, count the ones in 5 seconds
+    sent_at = []
+    for _ in range(200):
+        clock[0] += bucket.reserve()
+        sent_at.append(clock[0])
+
+    for index, started_at in enumerate(sent_at):
+        in_window = [t for t in sent_at[index:] if t < started_at + 5]
+        assert len(in_window) <= 50
+
+
+def test_bucket_pause(clock):
+    bucket = TokenBucket(rate=8, burst=10)
+    bucket.pause(3)
+
+    assert bucket.reserve() == pytest.approx(3)
+    clock[0] += 3
+    assert bucket.reserve() == 0
+
+
+def test_public_api_quota_error_is_retried(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: None)
+    responses = [
+        Response(content=b'{"error": {"type": "Exception", "code": 4}}'),
+        Response(content=b'{"data": []}'),
+    ]
+    limiter = RateLimiter()
+
+    response = limiter.send(
+        "https://api.deezer.com/album/1", lambda: responses.pop(0)
+    )
+
+    assert response.content == b'{"data": []}'
+    assert limiter.get_stats()["public-api"]["retries"] == 1
+
+
+def test_other_api_errors_are_not_retried(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: None)
+    limiter = RateLimiter()
+
+    response = limiter.send(
+        "https://api.deezer.com/album/1",
+        lambda: Response(content=b'{"error": {"code": 800}}'),
+    )
+
+    assert response.content == b'{"error": {"code": 800}}'
+    assert limiter.get_stats()["public-api"]["retries"] == 0
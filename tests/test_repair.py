@@ -0,0 +1,141 @@
+import os
+
+import pytest
+
+import deezer.crypto as crypto
+import deezer.songutils as songutils
+from deezer.benchmark import BENCHMARK_SONG, FakeSession, make_encrypted_song
+from deezer.library import LibraryIndex, LIBRARY_INDEX_FILE_NAME
+from deezer.pictures import PictureStore
+from deezer.repair import (
+    decrypt_file_in_place,
+    decrypt_paths,
+    find_audio_files,
+    get_audio_bounds,
+    get_song_id_from_filename,
+    get_song_id_from_tags,
+)
+
+SONG_ID = BENCHMARK_SONG["SNG_ID"]
+# Whole stripe groups, then a partial stripe
+AUDIO_SIZE = 10 * crypto.STRIPE_GROUP_SIZE + 1000
+
+
+@pytest.fixture(scope="module")
+def song_audio():
+    return make_encrypted_song(SONG_ID, AUDIO_SIZE)
+
+
+def write_song_file(file_path, audio, tagged=True):
+    """Song file as the Downloader writes it, with its ID3v2 and ID3v1.1 tags"""
+    with open(file_path, "wb") as fo:
+        if tagged:
+            songutils.writeid3v2(
+                PictureStore(FakeSession(picture_size=1024)), fo, BENCHMARK_SONG
+            )
+        fo.write(audio)
+        if tagged:
+            songutils.writeid3v1_1(fo, BENCHMARK_SONG)
+
+
+def read_audio(file_path):
+    with open(file_path, "rb") as f:
+        data = f.read()
+
+    start, end = get_audio_bounds(data)
+    return data[start:end]
+
+
+def test_get_song_id_from_tags(tmp_path, song_audio):
+    song_file = tmp_path / "song.flac"
+    write_song_file(song_file, song_audio[1])
+
+    assert get_song_id_from_tags(song_file.read_bytes()) == SONG_ID
+    assert get_song_id_from_tags(song_audio[1]) is None
+
+
+def test_get_song_id_from_filename():
+    assert get_song_id_from_filename("/music/3135556.flac") == "3135556"
+    assert get_song_id_from_filename("/music/Artist - Title [42].mp3") == "42"
+    assert get_song_id_from_filename("/music/Artist - Title 42.mp3") is None
+
+
+def test_decrypt_file_in_place(tmp_path, song_audio):
+    plain, encrypted = song_audio
+    song_file = tmp_path / "Daft Punk - Harder, Better, Faster, Stronger.flac"
+    write_song_file(song_file, encrypted)
+    size = os.path.getsize(song_file)
+
+    result = decrypt_file_in_place(str(song_file))
+
+    assert result == {"error": False, "decrypted": True, "song_id": SONG_ID}
+    assert read_audio(song_file) == plain
+    assert os.path.getsize(song_file) == size
+    assert get_song_id_from_tags(song_file.read_bytes()) == SONG_ID
+
+
+def test_decrypted_file_is_left_as_is(tmp_path, song_audio):
+    song_file = tmp_path / "song.flac"
+    write_song_file(song_file, song_audio[1])
+    decrypt_file_in_place(str(song_file))
+    decrypted = song_file.read_bytes()
+
+    assert decrypt_file_in_place(str(song_file)) == {
+        "error": False,
+        "decrypted": False,
+    }
+    assert song_file.read_bytes() == decrypted
+
+
+def test_wrong_song_id_leaves_the_file(tmp_path):
+    _, encrypted = make_encrypted_song("1", AUDIO_SIZE)
+    song_file = tmp_path / "song.flac"
+    write_song_file(song_file, encrypted)
+    content = song_file.read_bytes()
+
+    result = decrypt_file_in_place(str(song_file))
+
+    assert result["error"]
+    assert song_file.read_bytes() == content
+
+
+def test_song_id_from_the_library(tmp_path, song_audio):
+    plain, encrypted = song_audio
+    song_file = tmp_path / "Tracks" / "Untagged.flac"
+    song_file.parent.mkdir()
+    write_song_file(song_file, encrypted, tagged=False)
+
+    library = LibraryIndex(str(tmp_path / LIBRARY_INDEX_FILE_NAME))
+    library.add_track({"sng_id": SONG_ID, "path": str(song_file)})
+
+    assert decrypt_file_in_place(str(song_file))["error"]
+    assert decrypt_file_in_place(str(song_file), library)["decrypted"]
+    assert song_file.read_bytes() == plain
+    library.close()
+
+
+def test_find_audio_files_skips_links(tmp_path):
+    (tmp_path / "Tracks").mkdir()
+    (tmp_path / "Album").mkdir()
+    song_file = tmp_path / "Tracks" / "song.flac"
+    song_file.write_bytes(b"")
+    (tmp_path / "Tracks" / "cover.jpg").write_bytes(b"")
+    os.symlink(song_file, tmp_path / "Album" / "song.flac")
+
+    assert list(find_audio_files([str(tmp_path)])) == [str(song_file)]
+
+
+def test_decrypt_paths_decrypts_hardlinks_once(tmp_path, song_audio):
+    plain, encrypted = song_audio
+    (tmp_path / "Tracks").mkdir()
+    (tmp_path / "Album").mkdir()
+    song_file = tmp_path / "Tracks" / "song.flac"
+    write_song_file(song_file, encrypted)
+    os.link(song_file, tmp_path / "Album" / "song.flac")
+
+    assert decrypt_paths([str(tmp_path)], workers=2) == {"decrypted": 1, "errors": 0}
+    assert read_audio(song_file) == plain
+    assert read_audio(tmp_path / "Album" / "song.flac") == plain
+
+    # Nothing left to decrypt
+    assert decrypt_paths([str(tmp_path)]) == {"decrypted": 0, "errors": 0}
@@ -0,0 +1,83 @@
+import os
+import resource
+import tracemalloc
+
+import pytest
+
+import deezer.crypto as crypto
+from deezer.benchmark import (
+    BENCHMARK_SONG,
+    BENCHMARK_SONG_ID,
+    check_stream_output,
+    make_benchmark_downloader,
+    make_stream_server,
+    stream_download,
+)
+from deezer.library import file_checksum
+
+SONG_SIZE = 64 * 1024 * 1024
+CHUNK_SIZE = crypto.DEFAULT_CHUNK_SIZE
+
+
+@pytest.fixture
+def stream(tmp_path):
+    """Downloader fetching a synthetic song from a local server, and the server"""
+
+    def start(size):
+        server, plain_group = make_stream_server(BENCHMARK_SONG_ID, size)
+        servers.append(server)
+        url = f"http://127.0.0.1:{server.server_address[1]}/song.mp3"
+        return make_benchmark_downloader(str(tmp_path), url, CHUNK_SIZE), plain_group
+
+    servers = []
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def get_max_rss():
+    """Peak resident memory of the process, in bytes"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def test_song_is_streamed_to_disk(stream, tmp_path):
+    # A small song first, so the imports and covers are already in memory
+    downloader, _ = stream(1024 * 1024)
+    os.remove(stream_download(downloader, str(tmp_path), 1024 * 1024))
+
+    downloader, plain_group = stream(SONG_SIZE)
+    max_rss = get_max_rss()
+    output_file = stream_download(downloader, str(tmp_path), SONG_SIZE)
+
+    assert get_max_rss() - max_rss < SONG_SIZE // 4
+    check_stream_output(output_file, plain_group, SONG_SIZE)
+
+
+def test_heap_does_not_grow_with_the_song_size(stream, tmp_path):
+    peaks = []
+
+    for size in (1024 * 1024, SONG_SIZE):
+        downloader, _ = stream(size)
+        tracemalloc.start()
+        try:
+            output_file = stream_download(downloader, str(tmp_path), size)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        os.remove(output_file)
+
+    assert peaks[-1] < peaks[0] * 1.5 + 4 * CHUNK_SIZE
+    assert peaks[-1] < 16 * CHUNK_SIZE
+
+
+def test_checksum_is_computed_while_writing(stream, tmp_path):
+    downloader, _ = stream(1024 * 1024)
+    song_data = {**BENCHMARK_SONG, "TRACK_TOKEN": "benchmark"}
+
+    result = downloader._download_song("MP3_320", song_data, str(tmp_path))
+
+    assert result["checksum"] == file_checksum(result["output_file_full_path"])
+    track = downloader._get_library().get_track(BENCHMARK_SONG_ID)
+    assert track["checksum"] == result["checksum"]